@@ -1,18 +1,21 @@
 # src/cli/cli.py
-from typing import Literal, Set
+import heapq
+from functools import lru_cache
+from typing import Dict, Iterable, List, Literal, Mapping, Optional, Sequence, Set
 
 import typer
 from rich.console import Console
 from rich.tree import Tree
 
-from ..core.call_graph import build_call_graph_from_repo
+from ..core.call_graph import CallGraph, build_call_graph_cached
 from ..core.call_mapper import map_calls_for_impacted_functions
 from ..core.constants import UNIMPORTANT_FUNCS
-from ..core.git_diff import get_commit_diff
+from ..core.git_diff import get_commit_diff, get_head_sha
 from ..core.impact_mapper import (
     collect_downstream_calls,
+    collect_per_source_calls,
     collect_upstream_calls,
-    map_changes_to_functions,
+    map_all_changes_to_functions,
 )
 from ..output.json_output import (
     format_analysis_results,
@@ -21,22 +24,66 @@ from ..output.json_output import (
 )
 from ..visualization.visualization import visualize_call_graph_pyvis
 
-console = Console()
+# Output is pre-styled markup; skip Rich's regex auto-highlighting and emoji
+# code scanning
+console = Console(
+    soft_wrap=True, highlight=False, emoji=False, log_time=False, log_path=False
+)
 app = typer.Typer()
 
+_UP_LABEL = "Upstream (calls this function)"
+_DOWN_LABEL = "Downstream (called by this function)"
+_UP_STYLE = "green"
+_DOWN_STYLE = "magenta"
+_ROOT_STYLE = "bold bright_blue"
+
+_UNIMP = UNIMPORTANT_FUNCS
+_DIM = "[dim]{}[/dim]".format
+_BOLD = "[bold]{}[/bold]".format
 
+
+@lru_cache(maxsize=4096)
 def fmt_func(func_name: str) -> str:
     """Return a Rich-friendly representation for a function name.
 
+    Results are cached since the same names recur across rendered trees.
+
     Args:
         func_name: The function name to format.
 
     Returns:
         A Rich-formatted string with bold or dim styling based on importance.
     """
-    if func_name in UNIMPORTANT_FUNCS:
-        return f"[dim]{func_name}[/dim]"
-    return f"[bold]{func_name}[/bold]"
+    return (_DIM if func_name in _UNIMP else _BOLD)(func_name)
+
+
+def add_func_branch(
+    tree: Tree, label: str, funcs: Set[str], guide_style: str, max_display: int
+) -> None:
+    """Add a labelled branch listing `funcs` in sorted order.
+
+    Only the ``max_display`` smallest names are sorted and rendered (``0``
+    renders all); the remainder is summarized in a final node.
+
+    Args:
+        tree: Tree to attach the branch to.
+        label: Branch label.
+        funcs: Function names to list.
+        guide_style: Rich style for the branch guide lines.
+        max_display: Maximum number of names to render, or ``0`` for no limit.
+    """
+    hidden = len(funcs) - max_display if max_display else 0
+    shown: Iterable[str]
+    if hidden > 0:
+        shown = heapq.nsmallest(max_display, funcs)
+    else:
+        shown = sorted(funcs)
+
+    branch = tree.add(label, guide_style=guide_style)
+    for func in shown:
+        branch.add(fmt_func(func))
+    if hidden > 0:
+        branch.add(f"[dim]... (+{hidden} more)[/dim]")
 
 
 @app.command()
@@ -46,11 +93,44 @@ def analyze(
     depth: int = typer.Option(1, "--depth", min=0),
     visualize: bool = typer.Option(False, "--visualize"),
     output: Literal["text", "json"] = typer.Option("text", "--output"),
+    max_display: int = typer.Option(
+        50,
+        "--max-display",
+        min=0,
+        help="Maximum callers/callees listed per function in text output (0 = all).",
+    ),
 ) -> None:
     """Analyze a commit and display impacted functions and their relationships.
 
     Use --output json for machine-readable JSON output suitable for CI/automation.
     """
+    analyze_with_graph(repo_path, commit, depth, visualize, output, max_display)
+
+
+def analyze_with_graph(
+    repo_path: str,
+    commit: str,
+    depth: int = 1,
+    visualize: bool = False,
+    output: Literal["text", "json"] = "text",
+    max_display: int = 50,
+    graph: Optional[CallGraph] = None,
+) -> None:
+    """Run the ``analyze`` command, optionally reusing a prebuilt call graph.
+
+    Intended for library use when analyzing several commits of one checkout.
+    Without ``graph``, the graph is built once per ``(repo_path, HEAD)`` and
+    reused by later calls in the same process.
+
+    Args:
+        repo_path: Path to the Git repository.
+        commit: Commit hash or ref to analyze.
+        depth: Call graph traversal depth.
+        visualize: Whether to render HTML call graphs.
+        output: ``"text"`` for terminal output or ``"json"`` for JSON.
+        max_display: Maximum callers/callees listed per function in text output.
+        graph: Prebuilt call graph of ``repo_path`` to use instead of building one.
+    """
     try:
         diff = get_commit_diff(repo_path, commit)
     except ValueError as exc:
@@ -69,11 +149,18 @@ def analyze(
             )
         return
 
-    graph = build_call_graph_from_repo(repo_path)
+    if graph is None:
+        graph = build_call_graph_cached(repo_path, get_head_sha(repo_path))
+
+    # Functions never calling or called (e.g. unused static helpers) are not
+    # in the graph; traversals are skipped for them
+    graph_nodes = graph.fwd.keys() | graph.rev.keys()
+
     json_results = []
 
+    impacted_by_file = map_all_changes_to_functions(repo_path, diff.items())
     for file, hunks in diff.items():
-        impacted_funcs = map_changes_to_functions(repo_path, file, hunks)
+        impacted_funcs = impacted_by_file[file]
         if not impacted_funcs:
             if output == "text":
                 console.print(
@@ -81,11 +168,26 @@ def analyze(
                 )
             continue
 
-        call_map = map_calls_for_impacted_functions(file, impacted_funcs, repo_path)
+        # Reuse the calls parsed while building the graph; headers are not
+        # part of the graph and are still parsed here
+        file_edges = graph.file_edges.get(file)
+        call_map: Mapping[str, Sequence[str]]
+        if file_edges is None:
+            call_map = map_calls_for_impacted_functions(file, impacted_funcs, repo_path)
+        else:
+            file_calls: Dict[str, List[str]] = {func: [] for func in impacted_funcs}
+            for caller, callee in file_edges:
+                if caller in file_calls:
+                    file_calls[caller].append(callee)
+            call_map = file_calls
 
         # Compute combined upstream/downstream for JSON output and visualization
-        downstream: Set[str] = collect_downstream_calls(graph, impacted_funcs, depth)
-        upstream: Set[str] = collect_upstream_calls(graph, impacted_funcs, depth)
+        present = [func for func in impacted_funcs if func in graph_nodes]
+        downstream: Set[str] = set()
+        upstream: Set[str] = set()
+        if present:
+            downstream = collect_downstream_calls(graph, present, depth)
+            upstream = collect_upstream_calls(graph, present, depth)
 
         # Generate JSON result for this file
         if output == "json":
@@ -100,35 +202,40 @@ def analyze(
                 )
             )
         else:
-            # Terminal-friendly text output - compute relationships per function
-            console.print(f"\n[bold cyan]{file}[/bold cyan]  Changed lines: {hunks}")
+            # Terminal-friendly text output - compute relationships per function.
+            # All function trees hang off one per-file tree so it renders in a
+            # single print.
+            file_tree = Tree(f"[bold cyan]{file}[/bold cyan]  Changed lines: {hunks}")
+
+            # One multi-source traversal per direction instead of one per function
+            upstream_by_func: Dict[str, Set[str]] = {}
+            downstream_by_func: Dict[str, Set[str]] = {}
+            if present:
+                upstream_by_func = collect_per_source_calls(
+                    graph, present, depth, "upstream"
+                )
+                downstream_by_func = collect_per_source_calls(
+                    graph, present, depth, "downstream"
+                )
 
             for func in impacted_funcs:
-                tree = Tree(fmt_func(func), guide_style="bold bright_blue")
+                tree = file_tree.add(fmt_func(func), guide_style=_ROOT_STYLE)
 
-                # Compute upstream and downstream for this specific function
-                func_upstream: Set[str] = collect_upstream_calls(graph, [func], depth)
-                func_downstream: Set[str] = collect_downstream_calls(
-                    graph, [func], depth
-                )
+                func_upstream = upstream_by_func.get(func, set())
+                func_downstream = downstream_by_func.get(func, set())
 
                 if func_upstream:
-                    up_branch = tree.add(
-                        "Upstream (calls this function)", guide_style="green"
+                    add_func_branch(
+                        tree, _UP_LABEL, func_upstream, _UP_STYLE, max_display
                     )
-                    for up_func in sorted(func_upstream):
-                        if up_func != func:
-                            up_branch.add(fmt_func(up_func))
 
                 if func_downstream:
-                    down_branch = tree.add(
-                        "Downstream (called by this function)", guide_style="magenta"
+                    add_func_branch(
+                        tree, _DOWN_LABEL, func_downstream, _DOWN_STYLE, max_display
                     )
-                    for down_func in sorted(func_downstream):
-                        if down_func != func:
-                            down_branch.add(fmt_func(down_func))
 
-                console.print(tree)
+            console.line()
+            console.print(file_tree)
 
         if visualize:
             visualize_call_graph_pyvis(
@@ -140,6 +247,7 @@ def analyze(
                 repo_path=repo_path,
                 commit_hash=commit,
                 source_file=file,
+                graph=graph,
             )
 
     # Output JSON if requested
@@ -1,13 +1,80 @@
 # src/core/call_graph.py
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Iterable
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    DefaultDict,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import networkx as nx
 
-from .parser import get_function_calls
+from .parser import get_function_calls_from_source
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None  # type: ignore[assignment]
 
-def build_graph_from_call_map(call_map: Dict[str, Iterable[str]]) -> nx.DiGraph:
+# Bump when the parser output format changes so stale cache entries are ignored
+CALLMAP_CACHE_VERSION = 1
+
+# Threads reading sources ahead of the parsers; reads are I/O-bound
+PREFETCH_THREADS = 8
+
+# Directory names never descended into when collecting C sources
+DEFAULT_SKIP_DIRS: AbstractSet[str] = frozenset(
+    {".git", "build", ".venv", "node_modules"}
+)
+
+
+class IndexedAdjacency(NamedTuple):
+    """Call graph adjacency over contiguous integer node ids."""
+
+    name_to_id: Dict[str, int]
+    id_to_name: List[str]
+    fwd_adj: List["array[int]"]  # id -> callee ids
+    rev_adj: List["array[int]"]  # id -> caller ids
+
+
+class CallGraph(NamedTuple):
+    """Repository call graph stored as forward and reverse adjacency lists.
+
+    Plain dicts avoid NetworkX's per-edge attribute dicts on the traversal hot
+    path; use ``to_networkx`` when a ``nx.DiGraph`` is needed. The per-file
+    call edges the graph was built from are kept so callers can look up a
+    file's calls without parsing it again. Graphs built from a repository
+    also carry an integer-id copy of the adjacency used by the traversals.
+    """
+
+    fwd: Dict[str, List[str]]  # caller -> unique callees, in first-seen order
+    rev: Dict[str, List[str]]  # callee -> unique callers, in first-seen order
+    # repo-relative POSIX path -> (caller, callee) per call site, in file order
+    file_edges: Dict[str, List[Tuple[str, str]]]
+    indexed: Optional[IndexedAdjacency] = None
+
+
+def build_graph_from_call_map(call_map: Mapping[str, Iterable[str]]) -> nx.DiGraph:
     """Create a directed call graph from a mapping of caller -> callees.
 
     Args:
@@ -26,23 +93,353 @@ def build_graph_from_call_map(call_map: Dict[str, Iterable[str]]) -> nx.DiGraph:
     return graph
 
 
-def build_call_graph_from_repo(repo_path: str) -> nx.DiGraph:
+def callmap_cache_dir() -> Path:
+    """Return the directory holding cached per-file call maps.
+
+    Uses ``IMPACTSCOPE_CACHE_DIR`` when set, otherwise ``~/.cache/impactscope``.
+
+    Returns:
+        Path to the ``callmap`` cache directory (not necessarily existing).
+    """
+    base = os.environ.get("IMPACTSCOPE_CACHE_DIR")
+    root = Path(base) if base else Path.home() / ".cache" / "impactscope"
+    return root / "callmap"
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _cache_file(abs_path: str) -> Path:
+    return callmap_cache_dir() / f"{hashlib.sha1(abs_path.encode()).hexdigest()}.json"
+
+
+def _read_cached_calls(
+    abs_path: str, mtime_ns: int, size: int
+) -> Optional[Dict[str, List[str]]]:
+    """Return the cached call map for a file, or ``None`` if missing or stale."""
+    try:
+        entry = _loads(_cache_file(abs_path).read_bytes())
+        if (
+            entry["version"] == CALLMAP_CACHE_VERSION
+            and entry["path"] == abs_path
+            and entry["mtime_ns"] == mtime_ns
+            and entry["size"] == size
+        ):
+            return entry["calls"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cached_calls(
+    abs_path: str, mtime_ns: int, size: int, calls: Dict[str, List[str]]
+) -> None:
+    """Atomically store a file's call map; I/O failures are ignored."""
+    entry = {
+        "version": CALLMAP_CACHE_VERSION,
+        "path": abs_path,
+        "mtime_ns": mtime_ns,
+        "size": size,
+        "calls": calls,
+    }
+    cache_dir = callmap_cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_dumps(entry))
+            os.replace(tmp_name, _cache_file(abs_path))
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    except OSError:
+        pass
+
+
+def _iter_c_files(
+    root: str, skip_dirs: AbstractSet[str] = DEFAULT_SKIP_DIRS
+) -> Iterator[str]:
+    """Yield paths of ``*.c`` files under ``root``.
+
+    Walks with ``os.scandir`` so directory entries are classified without
+    extra ``stat`` calls; symlinked directories are not followed and
+    unreadable directories are skipped.
+
+    Args:
+        root: Directory to walk.
+        skip_dirs: Directory names to prune from the walk.
+
+    Yields:
+        Path strings of C source files.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip_dirs:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(".c") and entry.is_file():
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def to_networkx(graph: CallGraph) -> nx.DiGraph:
+    """Convert a ``CallGraph`` to a NetworkX directed graph.
+
+    Args:
+        graph: Adjacency-list call graph.
+
+    Returns:
+        A NetworkX directed graph with the same edges.
+    """
+    return build_graph_from_call_map(graph.fwd)
+
+
+def index_adjacency(
+    fwd: Mapping[str, Iterable[str]], rev: Mapping[str, Iterable[str]]
+) -> IndexedAdjacency:
+    """Renumber a call graph's functions to contiguous integer ids.
+
+    Args:
+        fwd: Caller -> callees mapping.
+        rev: Callee -> callers mapping.
+
+    Returns:
+        An ``IndexedAdjacency`` whose adjacency lists are ``array('i')`` ids.
+    """
+    id_to_name = list(dict.fromkeys([*fwd, *rev]))
+    name_to_id = {name: i for i, name in enumerate(id_to_name)}
+    empty: Iterable[str] = ()
+
+    def to_ids(mapping: Mapping[str, Iterable[str]]) -> List["array[int]"]:
+        return [
+            array("i", [name_to_id[n] for n in mapping.get(name, empty)])
+            for name in id_to_name
+        ]
+
+    return IndexedAdjacency(name_to_id, id_to_name, to_ids(fwd), to_ids(rev))
+
+
+class _PrefetchedSource(NamedTuple):
+    """A C file read ahead of parsing."""
+
+    path: str  # absolute path
+    mtime_ns: int
+    size: int
+    calls: Optional[Dict[str, List[str]]]  # cached call map, if still valid
+    source: bytes  # file contents, read only on a cache miss
+
+
+def _prefetch_source(file_path: str, use_cache: bool = True) -> _PrefetchedSource:
+    """Stat a file and load its cached call map or, failing that, its bytes."""
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(abs_path)
+    calls = None
+    if use_cache:
+        calls = _read_cached_calls(abs_path, stat.st_mtime_ns, stat.st_size)
+    source = b""
+    if calls is None:
+        with open(abs_path, "rb") as f:
+            source = f.read()
+    return _PrefetchedSource(abs_path, stat.st_mtime_ns, stat.st_size, calls, source)
+
+
+def _flatten_calls(calls: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    return [(caller, callee) for caller, callees in calls.items() for callee in callees]
+
+
+def _parse_edges(item: _PrefetchedSource, use_cache: bool) -> List[Tuple[str, str]]:
+    """Parse a prefetched file if needed and return its ``(caller, callee)`` pairs.
+
+    Runs in worker processes on cache misses; a flat list pickles smaller
+    than the nested call map and is merged without rebuilding per-file dicts.
+    """
+    calls = item.calls
+    if calls is None:
+        calls = get_function_calls_from_source(item.source)
+        if use_cache:
+            _write_cached_calls(item.path, item.mtime_ns, item.size, calls)
+    return _flatten_calls(calls)
+
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+def _bounded_map(
+    executor: ThreadPoolExecutor,
+    fn: Callable[[_T], _R],
+    items: Iterable[_T],
+    window: int,
+) -> Iterator[_R]:
+    """Like ``executor.map`` but with at most ``window`` results in flight."""
+    pending: Deque["Future[_R]"] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _parse_in_pool(
+    executor: ProcessPoolExecutor,
+    prefetched: Iterable[_PrefetchedSource],
+    use_cache: bool,
+    window: int,
+) -> Iterator[List[Tuple[str, str]]]:
+    """Yield each file's edges in order, parsing cache misses in ``executor``.
+
+    At most ``window`` files are pending at once so prefetched sources don't
+    pile up in memory when parsing is the bottleneck.
+    """
+    pending: Deque[Union["Future[List[Tuple[str, str]]]", List[Tuple[str, str]]]]
+    pending = deque()
+    for item in prefetched:
+        if item.calls is not None:
+            pending.append(_flatten_calls(item.calls))
+        else:
+            pending.append(executor.submit(_parse_edges, item, use_cache))
+        while pending and (
+            len(pending) >= window or not isinstance(pending[0], Future)
+        ):
+            head = pending.popleft()
+            yield head.result() if isinstance(head, Future) else head
+    while pending:
+        head = pending.popleft()
+        yield head.result() if isinstance(head, Future) else head
+
+
+def _merge_edges(file_edges: Dict[str, List[Tuple[str, str]]]) -> CallGraph:
+    """Merge per-file call edges into a ``CallGraph``, dropping duplicates."""
+    # dicts used as insertion-ordered sets
+    fwd: DefaultDict[str, Dict[str, None]] = defaultdict(dict)
+    rev: DefaultDict[str, Dict[str, None]] = defaultdict(dict)
+
+    for edges in file_edges.values():
+        for caller, callee in edges:
+            fwd[caller][callee] = None
+            rev[callee][caller] = None
+
+    fwd_lists = {caller: list(callees) for caller, callees in fwd.items()}
+    rev_lists = {callee: list(callers) for callee, callers in rev.items()}
+    return CallGraph(
+        fwd=fwd_lists,
+        rev=rev_lists,
+        file_edges=file_edges,
+        indexed=index_adjacency(fwd_lists, rev_lists),
+    )
+
+
+def default_max_workers() -> int:
+    """Return the number of parser processes to use for graph construction.
+
+    Honors the ``IMPACTSCOPE_MAX_WORKERS`` environment variable and falls back
+    to the CPU count; a value that is not an integer is ignored with a warning.
+
+    Returns:
+        A positive worker count.
+    """
+    env_value = os.environ.get("IMPACTSCOPE_MAX_WORKERS")
+    if env_value:
+        try:
+            return max(1, int(env_value))
+        except ValueError:
+            warnings.warn(
+                f"Ignoring invalid IMPACTSCOPE_MAX_WORKERS={env_value!r}; "
+                "expected an integer",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+    return os.cpu_count() or 1
+
+
+def build_call_graph_from_repo(
+    repo_path: str,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+    skip_dirs: AbstractSet[str] = DEFAULT_SKIP_DIRS,
+) -> CallGraph:
     """Build a repository-wide call graph by parsing all C files.
 
+    A small thread pool reads sources (or their cache entries) ahead of the
+    parsers so disk latency overlaps parsing. Files are parsed in a process
+    pool, started before the reader threads, since parsing is CPU-bound and
+    each file is independent; workers
+    return flat edge lists that are merged sequentially in the parent. Unless
+    disabled, per-file results are cached on disk (see ``_read_cached_calls``
+    and ``_write_cached_calls``) so unchanged files are not re-parsed.
+
     Args:
         repo_path: Path to the repository root.
+        max_workers: Number of parser processes. Defaults to
+                     ``default_max_workers()``; ``1`` parses serially.
+        use_cache: Whether to read and write the on-disk call-map cache.
+        skip_dirs: Directory names excluded from the source walk.
 
     Returns:
-        A NetworkX directed graph containing all function call relationships
-        found in C source files within the repository.
+        A ``CallGraph`` containing all function call relationships found in C
+        source files within the repository, with per-file call edges keyed by
+        repo-relative POSIX path (the form used by ``get_commit_diff``).
     """
-    graph = nx.DiGraph()
-    repo_root = Path(repo_path)
+    files = list(_iter_c_files(repo_path, skip_dirs))
+    rel_paths = [os.path.relpath(f, repo_path).replace(os.sep, "/") for f in files]
 
-    for c_file in repo_root.rglob("*.c"):
-        call_map = get_function_calls(str(c_file))
-        for caller, callees in call_map.items():
-            for callee in callees:
-                graph.add_edge(caller, callee)
+    if max_workers is None:
+        max_workers = default_max_workers()
+    window = 2 * max(max_workers, 1)
 
-    return graph
+    prefetch = partial(_prefetch_source, use_cache=use_cache)
+    if max_workers <= 1 or len(files) <= 1:
+        with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as io_pool:
+            prefetched = _bounded_map(io_pool, prefetch, files, window)
+            edges = (_parse_edges(item, use_cache) for item in prefetched)
+            return _merge_edges(dict(zip(rel_paths, edges)))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # With the fork start method every worker is forked on the first
+        # submit. Doing that before the prefetch threads start keeps workers
+        # from inheriting locks held by a thread that does not exist in them
+        executor.submit(int).result()
+        with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as io_pool:
+            prefetched = _bounded_map(io_pool, prefetch, files, window)
+            results = _parse_in_pool(executor, prefetched, use_cache, window)
+            return _merge_edges(dict(zip(rel_paths, results)))
+
+
+@lru_cache(maxsize=4)
+def _cached_build(repo_path: str, head_sha: str) -> CallGraph:
+    return build_call_graph_from_repo(repo_path)
+
+
+def build_call_graph_cached(repo_path: str, head_sha: str) -> CallGraph:
+    """Return the repository call graph, reusing graphs built in this process.
+
+    Graphs are memoized per ``(repo_path, head_sha)`` so repeated analyses of
+    the same checkout (e.g. several commits in one script or CI job) build the
+    graph once. Uncommitted edits made between calls are not detected; the
+    on-disk per-file cache still applies on a miss. The returned graph is
+    shared and must not be mutated.
+
+    Args:
+        repo_path: Path to the repository root.
+        head_sha: Commit SHA currently checked out in ``repo_path``.
+
+    Returns:
+        A ``CallGraph`` for the repository.
+    """
+    return _cached_build(os.path.abspath(repo_path), head_sha)
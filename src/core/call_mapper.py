@@ -1,6 +1,7 @@
 # src/core/call_mapper.py
 from pathlib import Path
-from typing import Dict, Iterable, List, Union
+from types import MappingProxyType
+from typing import Iterable, Mapping, Tuple, Union
 
 from .parser import get_function_calls
 
@@ -9,9 +10,12 @@ def map_calls_for_impacted_functions(
     file_path: Union[str, Path],
     impacted_funcs: Iterable[str],
     repo_path: Union[str, Path, None] = None,
-) -> Dict[str, List[str]]:
+) -> Mapping[str, Tuple[str, ...]]:
     """Return calls made by the impacted functions in a given file.
 
+    Legacy helper that parses ``file_path`` again; when a ``CallGraph`` is
+    available, look the file up in ``CallGraph.file_edges`` instead.
+
     Args:
         file_path: Path to the C file (str or Path). If `repo_path` is provided,
                    `file_path` is considered relative to `repo_path`.
@@ -19,7 +23,7 @@ def map_calls_for_impacted_functions(
         repo_path: Optional repository root to resolve `file_path`.
 
     Returns:
-        Dictionary mapping function name to list of called function names.
+        Read-only mapping of function name to a tuple of called function names.
     """
     if repo_path:
         full_path = Path(repo_path) / file_path
@@ -27,6 +31,6 @@ def map_calls_for_impacted_functions(
         full_path = Path(file_path)
 
     all_calls = get_function_calls(str(full_path))  # returns {func: [called funcs]}
-    result = {func: all_calls.get(func, []) for func in impacted_funcs}
-
-    return result
+    return MappingProxyType(
+        {func: tuple(all_calls.get(func, ())) for func in impacted_funcs}
+    )
@@ -1,7 +1,65 @@
 # src/core/git_diff.py
-from typing import Dict, List, Tuple
+import codecs
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from git import BadName, Repo
+from git import BadName, Commit, Repo
+
+try:
+    import pygit2
+except ImportError:  # pragma: no cover - optional speedup
+    pygit2 = None  # type: ignore[assignment]
+
+# Start of each file's section in ``git diff-tree -p`` output
+_DIFF_GIT_HEADER = re.compile(rb"^diff --git ", re.MULTILINE)
+
+# Hunk header; groups are the hunk's first line and line count in the new file
+_HUNK_RE = re.compile(rb"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+
+# Extensions of the files whose changes are reported
+_C_EXTS = frozenset((".c", ".h"))
+
+# Number of repositories whose handles are kept open between calls
+REPO_CACHE_SIZE = 4
+
+# Number of commits whose changed ranges are kept by ``get_commit_diff``
+DIFF_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=REPO_CACHE_SIZE)
+def _repo(repo_path: str) -> Repo:
+    """Return a GitPython ``Repo``, opened once per path.
+
+    Reusing the handle skips git-directory discovery and config parsing and
+    keeps GitPython's persistent ``git cat-file`` processes alive.
+    """
+    return Repo(repo_path)
+
+
+@lru_cache(maxsize=REPO_CACHE_SIZE)
+def _pygit2_repo(repo_path: str) -> "pygit2.Repository":
+    """Return a ``pygit2.Repository``, opened once per path."""
+    return pygit2.Repository(repo_path)
+
+
+def get_head_sha(repo_path: str) -> str:
+    """Return the SHA of the commit checked out in a repository.
+
+    Args:
+        repo_path: Path to the Git repository.
+
+    Returns:
+        The full hexadecimal SHA of ``HEAD``.
+
+    Raises:
+        ValueError: If the repository has no commits yet.
+    """
+    try:
+        return _repo(repo_path).head.commit.hexsha
+    except ValueError as exc:
+        msg = f"Repository '{repo_path}' has no checked-out commit"
+        raise ValueError(msg) from exc
 
 
 def get_commit_diff(
@@ -9,123 +67,259 @@ def get_commit_diff(
 ) -> Dict[str, List[Tuple[int, int]]]:
     """Return changed line ranges for C/H files in a commit.
 
+    Uses libgit2 through ``pygit2`` when it is installed, diffing trees in C
+    with no context lines; otherwise runs one ``git diff-tree`` and parses its
+    patch output. Both backends detect renames across all files and then keep
+    the C/H files by their new path, so they return the same ranges: a file
+    renamed to a C/H name (e.g. from ``.cpp``) reports only its changed lines,
+    and one renamed away from ``.c``/``.h`` is not reported.
+
     Args:
         repo_path: Path to the Git repository.
         commit_hash: Commit hash or ref to analyze.
 
     Returns:
         Dictionary mapping file paths to lists of (start_line, end_line) tuples
-        representing changed line ranges.
+        representing changed line ranges in the new version of each file.
+        Deleted files map to an empty list.
 
     Raises:
         ValueError: If the commit hash does not exist in the repository.
     """
-    repo = Repo(repo_path)
+    # Refs are resolved on every call so a moved ``HEAD`` is never served
+    # stale; the diff itself is memoized per commit SHA
+    sha = _resolve_sha(repo_path, commit_hash)
+    return {path: list(ranges) for path, ranges in _cached_commit_diff(repo_path, sha)}
+
+
+@lru_cache(maxsize=DIFF_CACHE_SIZE)
+def _cached_commit_diff(
+    repo_path: str, sha: str
+) -> Tuple[Tuple[str, Tuple[Tuple[int, int], ...]], ...]:
+    """Return the changed ranges of a resolved commit, frozen for caching."""
+    return tuple(
+        (path, tuple(ranges)) for path, ranges in iter_commit_diff(repo_path, sha)
+    )
+
+
+def _resolve_sha(repo_path: str, commit_hash: str) -> str:
+    """Return the full SHA `commit_hash` resolves to with the active backend."""
+    if pygit2 is not None:
+        return str(_pygit2_commit(repo_path, commit_hash).id)
+    return _git_commit(repo_path, commit_hash).hexsha
+
+
+def iter_commit_diff(
+    repo_path: str, commit_hash: str
+) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """Yield ``(path, ranges)`` for each C/H file changed in a commit.
+
+    Streaming equivalent of ``get_commit_diff``: each file's patch is
+    processed and released before the next one, so consumers can start on
+    early files without holding every file's ranges at once.
+
+    Args:
+        repo_path: Path to the Git repository.
+        commit_hash: Commit hash or ref to analyze.
+
+    Returns:
+        Iterator of (file_path, ranges) pairs in diff order, with ranges as in
+        ``get_commit_diff``.
+
+    Raises:
+        ValueError: If the commit hash does not exist in the repository. The
+            commit is resolved before the iterator is returned.
+    """
+    if pygit2 is not None:
+        return _iter_commit_diff_pygit2(repo_path, commit_hash)
+    return _iter_commit_diff_git(repo_path, commit_hash)
+
+
+def _is_c_source(path: str) -> bool:
+    # Both extensions are two characters, so one slice and set lookup suffice
+    return path[-2:] in _C_EXTS
+
+
+def _pygit2_commit(repo_path: str, commit_hash: str) -> "pygit2.Commit":
+    """Resolve `commit_hash` to a ``pygit2.Commit``, raising ValueError if unknown."""
+    repo = _pygit2_repo(repo_path)
     try:
-        commit = repo.commit(commit_hash)
-    except (BadName, ValueError) as exc:
+        return repo.revparse_single(commit_hash).peel(pygit2.Commit)
+    except (KeyError, ValueError) as exc:
         msg = f"Commit '{commit_hash}' does not exist in repository '{repo_path}'"
         raise ValueError(msg) from exc
-    diff_data: Dict[str, List[Tuple[int, int]]] = {}
 
-    for diff in commit.diff(
-        commit.parents[0] if commit.parents else None, create_patch=True
+
+def _iter_commit_diff_pygit2(
+    repo_path: str, commit_hash: str
+) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """``iter_commit_diff`` backed by libgit2."""
+    commit = _pygit2_commit(repo_path, commit_hash)
+    if commit.parents:
+        diff = commit.parents[0].tree.diff_to_tree(commit.tree, context_lines=0)
+    else:
+        diff = commit.tree.diff_to_tree(context_lines=0, swap=True)
+    # pygit2 takes no pathspec, but listing deltas generates no patches; the
+    # costly part for other files is rename detection, which reads blobs.
+    # Only an added or deleted C/H file can take part in a relevant rename
+    if any(
+        delta.status_char() in "AD" and _is_c_source(delta.new_file.path)
+        for delta in diff.deltas
     ):
-        # For renamed files, use the new name (b_path). Otherwise use a_path or b_path.
-        if diff.a_path and diff.b_path and diff.a_path != diff.b_path:
-            # This is a rename - use the new name
-            path_candidate = diff.b_path
-        else:
-            # Normal case: use whichever path is available
-            path_candidate = diff.a_path or diff.b_path  # type: ignore[assignment]
+        diff.find_similar()
+    return _pygit2_ranges(diff)
 
-        if path_candidate is None:
+
+def _pygit2_ranges(diff: "pygit2.Diff") -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """Yield the changed ranges of each C/H delta of a libgit2 diff."""
+    for index, delta in enumerate(diff.deltas):
+        # new_file.path is the new name for renames and the old one for deletions
+        path_str = delta.new_file.path
+        if not _is_c_source(path_str):
+            continue
+        if delta.status_char() == "D":
+            yield path_str, []
             continue
 
-        # Now we know path_candidate is not None, so it must be a string
-        path_str = path_candidate
-
-        if path_str.endswith(".c") or path_str.endswith(".h"):
-            hunks: List[Tuple[int, int]] = []
-            # Handle the case where diff.diff might be None or already a string
-            diff_content = diff.diff
-            if diff_content is None:
-                continue
-
-            # Try to decode if it's bytes, otherwise convert to string
-            try:
-                if hasattr(diff_content, "decode"):
-                    decoded_content = diff_content.decode(errors="ignore")
-                else:
-                    decoded_content = str(diff_content)
-            except (AttributeError, UnicodeDecodeError):
-                decoded_content = str(diff_content)
-
-            patch_lines = decoded_content.replace("\r\n", "\n").split("\n")
-
-            # Parse hunk by hunk to find actual changed lines
-            i = 0
-            changed_lines: set[Tuple[int, int]] = set()
-            while i < len(patch_lines):
-                if patch_lines[i].startswith("@@"):
-                    # Parse hunk header to get the new file line offset
-                    parts = patch_lines[i].split()
-                    new_start_line = None
-                    for part in parts[1:]:
-                        if part.startswith("+"):
-                            # Extract the starting line number in the new file
-                            try:
-                                new_start_line = int(part.split(",")[0][1:])
-                                break
-                            except (ValueError, IndexError):
-                                continue
-
-                    if new_start_line is None:
-                        i += 1
-                        continue
-
-                    # Parse the hunk content to find actual changed lines
-                    i += 1  # Move to first line after header
-                    current_line = new_start_line
-
-                    while i < len(patch_lines) and not patch_lines[i].startswith("@@"):
-                        line = patch_lines[i]
-                        if line.startswith("+") or line.startswith("-"):
-                            # This is an added or deleted line - record it as a changed line
-                            changed_lines.add((current_line, current_line))
-                            if line.startswith("+"):
-                                current_line += 1
-                            # Note: deleted lines don't advance the line counter for the new file
-                        elif not line.startswith("\\"):
-                            # This is a context line
-                            current_line += 1
-
-                        i += 1
-                else:
-                    i += 1
-
-            # Group consecutive changed lines into ranges
-            if changed_lines:
-                sorted_lines = sorted(changed_lines)
-                grouped_ranges = []
-                start_line = end_line = sorted_lines[0][
-                    0
-                ]  # Get the line number from (line, line) tuple
-
-                for line_tuple in sorted_lines[1:]:
-                    current_line = line_tuple[0]
-                    if current_line == end_line + 1:
-                        # Consecutive line, extend the range
-                        end_line = current_line
-                    else:
-                        # Gap found, save current range and start new one
-                        grouped_ranges.append((start_line, end_line))
-                        start_line = end_line = current_line
-
-                # Add the last range
-                grouped_ranges.append((start_line, end_line))
-                diff_data[path_str] = grouped_ranges
+        # Without context lines a hunk's changed lines are exactly its new-side
+        # span; a pure deletion is reported at the line following it.
+        # The patch is generated per delta and dropped once its hunks are read
+        grouped_ranges: List[Tuple[int, int]] = []
+        range_start: Optional[int] = None
+        range_end = -2
+        for hunk in diff[index].hunks:
+            if hunk.new_lines:
+                start, end = hunk.new_start, hunk.new_start + hunk.new_lines - 1
             else:
-                diff_data[path_str] = []
+                start = end = hunk.new_start + 1
+            if start > range_end + 1:
+                if range_start is not None:
+                    grouped_ranges.append((range_start, range_end))
+                range_start = start
+            range_end = max(range_end, end)
+        if range_start is not None:
+            grouped_ranges.append((range_start, range_end))
+        yield path_str, grouped_ranges
+
+
+def _git_commit(repo_path: str, commit_hash: str) -> Commit:
+    """Resolve `commit_hash` with GitPython, raising ValueError if unknown."""
+    try:
+        return _repo(repo_path).commit(commit_hash)
+    except (BadName, ValueError) as exc:
+        msg = f"Commit '{commit_hash}' does not exist in repository '{repo_path}'"
+        raise ValueError(msg) from exc
+
+
+def _iter_commit_diff_git(
+    repo_path: str, commit_hash: str
+) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """``iter_commit_diff`` backed by a single ``git diff-tree`` call."""
+    repo = _repo(repo_path)
+    commit = _git_commit(repo_path, commit_hash)
+
+    # One subprocess for the whole commit: zero-context patches with renames
+    # detected. No pathspec is passed: git applies it before rename detection,
+    # which would turn a rename changing the extension into an add or delete.
+    # Non-C paths are dropped while parsing, by their new name
+    base = commit.parents[0].hexsha if commit.parents else "--root"
+    output = repo.git.diff_tree(
+        base,
+        commit.hexsha,
+        "-r",
+        "-p",
+        "-M",
+        "--unified=0",
+        "--no-color",
+        "--no-ext-diff",
+        stdout_as_string=False,
+    )
+    return _patch_ranges(output)
+
+
+def _patch_ranges(output: bytes) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """Yield the changed ranges of each C/H file in ``git diff-tree`` output."""
+    # Sections are sliced one at a time rather than split up front, so only
+    # the current file's patch is copied out of the output
+    headers = list(_DIFF_GIT_HEADER.finditer(output))
+    ends = [match.start() for match in headers[1:]] + [len(output)]
+    for match, end in zip(headers, ends):
+        header, _, patch = output[match.end() : end].partition(b"\n@@")
+        path_str, deleted = _patch_path(header)
+        if path_str is None or not _is_c_source(path_str):
+            continue
+        # Deleted files have no lines left to attribute changes to
+        yield path_str, [] if deleted else _changed_ranges(b"@@" + patch)
+
+
+def _unquote_path(raw: bytes) -> str:
+    """Decode a path from a patch header, undoing git's C-style quoting."""
+    if raw.startswith(b'"') and raw.endswith(b'"'):
+        raw = codecs.escape_decode(raw[1:-1])[0]
+    return raw.decode("utf-8", errors="surrogateescape")
+
+
+def _patch_path(header: bytes) -> Tuple[Optional[str], bool]:
+    """Return the new path of one file's patch header and whether it was deleted.
+
+    ``header`` is everything after ``diff --git `` up to the first hunk.
+    """
+    first_line, *lines = header.split(b"\n")
+    new_path: Optional[str] = None
+    for line in lines:
+        if line.startswith(b"rename to "):
+            new_path = _unquote_path(line[len(b"rename to ") :])
+        elif line.startswith(b"+++ "):
+            target = line[4:]
+            if target == b"/dev/null":
+                break
+            new_path = _unquote_path(target)[2:]  # strip "b/"
+        elif line.startswith(b"deleted file mode"):
+            break
+    else:
+        if new_path is not None:
+            return new_path, False
+        # No ---/+++ lines (mode-only or binary change): "a/P b/P" names P twice
+        if first_line.startswith(b'"'):
+            return _unquote_path(first_line.split(b'" "', 1)[0] + b'"')[2:], False
+        return _unquote_path(first_line[2 : (len(first_line) - 1) // 2]), False
+
+    # Deleted file: take the old path from the "--- a/P" line
+    for line in lines:
+        if line.startswith(b"--- "):
+            return _unquote_path(line[4:])[2:], True
+    return None, True
+
+
+def _changed_ranges(patch: bytes) -> List[Tuple[int, int]]:
+    """Return the changed line ranges of one file's zero-context hunks.
+
+    Args:
+        patch: The file's ``--unified=0`` hunks.
+
+    Returns:
+        Sorted, merged ``(start_line, end_line)`` ranges in the new file.
+    """
+    # Without context lines a hunk's changed lines are exactly its new-side
+    # span, so only the headers are read; the hunk bodies are never split
+    # into lines. Hunks arrive in file order, so ranges grow in place.
+    grouped_ranges: List[Tuple[int, int]] = []
+    range_start: Optional[int] = None
+    range_end = -2
+    for match in _HUNK_RE.finditer(patch):
+        start = int(match.group(1))
+        count = int(match.group(2) or b"1")
+        if count:
+            end = start + count - 1
+        else:
+            # A pure deletion's header names the line before it
+            start = end = start + 1
+        if start > range_end + 1:
+            if range_start is not None:
+                grouped_ranges.append((range_start, range_end))
+            range_start = start
+        range_end = max(range_end, end)
 
-    return diff_data
+    if range_start is not None:
+        grouped_ranges.append((range_start, range_end))
+    return grouped_ranges
@@ -1,11 +1,62 @@
 # src/core/impact_mapper.py
-from pathlib import Path
-from typing import Iterable, List, Sequence, Set, Tuple
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import accumulate, chain, islice
+from operator import attrgetter
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import networkx as nx
 
+from .call_graph import CallGraph, IndexedAdjacency
 from .parser import get_function_nodes
 
+GraphLike = Union[CallGraph, nx.DiGraph]
+
+# Number of files whose function line ranges ``_function_columns`` keeps
+FUNCTION_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=FUNCTION_CACHE_SIZE)
+def _function_columns(
+    file_path: str, mtime_ns: int, size: int
+) -> Tuple[Tuple[str, ...], Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]:
+    """Return the functions of a C file as columns sorted by start line.
+
+    Memoized on the file's stat like the parse cache, so mapping an unchanged
+    file again skips the query and the sort.
+
+    Args:
+        file_path: Absolute path to the C source file.
+        mtime_ns: Modification time of the file, in nanoseconds.
+        size: Size of the file in bytes.
+
+    Returns:
+        Names, start lines, end lines and running maximum end lines.
+    """
+    functions = sorted(get_function_nodes(file_path), key=attrgetter("start"))
+    # Column layout: the sweep only touches flat int sequences
+    names = tuple(func.name for func in functions)
+    starts = tuple(func.start for func in functions)
+    ends = tuple(func.end for func in functions)
+    # reach[i] is the furthest end line of functions[0..i]; it is sorted even
+    # when function ranges nest, so it can be bisected like `starts`
+    reach = tuple(accumulate(ends, max))
+    return names, starts, ends, reach
+
 
 def map_changes_to_functions(
     repo_path: str, file_path: str, hunks: Sequence[Tuple[int, int]]
@@ -20,26 +71,161 @@ def map_changes_to_functions(
     Returns:
         List of function names that overlap with the changed line ranges.
     """
-    full_path = Path(repo_path) / file_path
+    full_path = os.path.abspath(os.path.join(repo_path, file_path))
+    st = os.stat(full_path)
+    names, starts, ends, reach = _function_columns(
+        full_path, st.st_mtime_ns, st.st_size
+    )
 
-    functions = get_function_nodes(str(full_path))
-
-    impacted: Set[str] = set()
+    # Dedup on the function's index rather than hashing its name
+    seen = bytearray(len(names))
+    impacted: List[str] = []
     for start_line, end_line in hunks:
-        for func in functions:
-            if not (end_line < func["start"] or start_line > func["end"]):
-                impacted.add(func["name"])
+        # Functions before `low` all end before the hunk starts; those from
+        # `high` on start after it ends
+        low = bisect_left(reach, start_line)
+        high = bisect_right(starts, end_line)
+        for index in range(low, high):
+            if ends[index] >= start_line and not seen[index]:
+                seen[index] = 1
+                impacted.append(names[index])
+
+    # A name defined in several preprocessor branches is still reported once
+    return list(dict.fromkeys(impacted))
+
+
+def map_all_changes_to_functions(
+    repo_path: str,
+    changes: Iterable[Tuple[str, Sequence[Tuple[int, int]]]],
+    max_workers: Optional[int] = None,
+) -> Dict[str, List[str]]:
+    """Run ``map_changes_to_functions`` for every changed file on threads.
+
+    Files are independent and tree-sitter parses without holding the GIL, so
+    the per-file work overlaps across threads. Each file is submitted as soon
+    as `changes` yields it, so parsing overlaps with a streamed diff.
 
-    return list(impacted)
+    Args:
+        repo_path: Path to the repository root.
+        changes: ``(file_path, ranges)`` pairs, such as ``diff.items()`` of a
+                 ``get_commit_diff`` result or ``iter_commit_diff`` output.
+        max_workers: Number of threads; defaults to the CPU count.
+
+    Returns:
+        Dictionary mapping each file, in the order received, to the function
+        names overlapping its changed ranges.
+    """
+    changes = iter(changes)
+    head = list(islice(changes, 2))
+    workers = max_workers or os.cpu_count() or 1
+    if len(head) < 2 or workers <= 1:
+        return {
+            file: map_changes_to_functions(repo_path, file, hunks)
+            for file, hunks in chain(head, changes)
+        }
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            file: executor.submit(map_changes_to_functions, repo_path, file, hunks)
+            for file, hunks in chain(head, changes)
+        }
+        return {file: future.result() for file, future in futures.items()}
+
+
+def _adjacency(
+    graph: GraphLike, direction: Literal["downstream", "upstream"]
+) -> Mapping[str, Iterable[str]]:
+    """Return the neighbor mapping to follow for `direction`."""
+    if isinstance(graph, CallGraph):
+        return graph.fwd if direction == "downstream" else graph.rev
+    # The raw adjacency dicts skip the AtlasView wrapper the public
+    # succ/pred views build on every lookup
+    return graph._succ if direction == "downstream" else graph._pred
+
+
+def _bounded_bfs(
+    adjacency: Mapping[str, Iterable[str]], start_funcs: Iterable[str], depth: int
+) -> Set[str]:
+    """Return nodes within `depth` hops of the start nodes, excluding them.
+
+    Expands one whole layer per step with set operations, which is cheaper
+    than queueing each node with its distance.
+    """
+    visited: Set[str] = set(start_funcs)
+    frontier = visited
+    reached: Set[str] = set()
+
+    for _ in range(depth):
+        frontier = set().union(*[adjacency.get(func, ()) for func in frontier])
+        frontier -= visited
+        if not frontier:
+            break
+        visited |= frontier
+        reached |= frontier
+
+    return reached
+
+
+def collect_reachable_ids(
+    adjacency: Sequence["array[int]"], src_ids: Iterable[int], depth: int
+) -> "array[int]":
+    """Return ids within `depth` hops of `src_ids` over integer adjacency lists.
+
+    Uses a ``bytearray`` visited bitmap and level-by-level ``array('i')``
+    frontiers, avoiding string hashing on every visited node.
+
+    Args:
+        adjacency: ``fwd_adj`` (downstream) or ``rev_adj`` (upstream) of an
+                   ``IndexedAdjacency``.
+        src_ids: Ids of the nodes to start from.
+        depth: Number of steps to traverse.
+
+    Returns:
+        Ids of the reached nodes, excluding the start nodes.
+    """
+    visited = bytearray(len(adjacency))
+    frontier = array("i")
+    for node in src_ids:
+        if not visited[node]:
+            visited[node] = 1
+            frontier.append(node)
+
+    reached = array("i")
+    for _ in range(depth):
+        next_frontier = array("i")
+        for node in frontier:
+            for neighbor in adjacency[node]:
+                if not visited[neighbor]:
+                    visited[neighbor] = 1
+                    next_frontier.append(neighbor)
+        if not next_frontier:
+            break
+        reached.extend(next_frontier)
+        frontier = next_frontier
+
+    return reached
+
+
+def _indexed_bfs(
+    indexed: IndexedAdjacency,
+    adjacency: Sequence["array[int]"],
+    start_funcs: Iterable[str],
+    depth: int,
+) -> Set[str]:
+    """Run ``collect_reachable_ids`` translating names at the boundaries."""
+    name_to_id = indexed.name_to_id
+    src_ids = [name_to_id[func] for func in start_funcs if func in name_to_id]
+    id_to_name = indexed.id_to_name
+    return {id_to_name[i] for i in collect_reachable_ids(adjacency, src_ids, depth)}
 
 
 def collect_downstream_calls(
-    graph: nx.DiGraph, start_funcs: Iterable[str], depth: int
+    graph: GraphLike, start_funcs: Iterable[str], depth: int
 ) -> Set[str]:
     """Traverse successors up to `depth` and return collected nodes, excluding seeds.
 
     Args:
-        graph: Directed call graph to traverse.
+        graph: Call graph to traverse (``CallGraph`` or ``nx.DiGraph``).
         start_funcs: Iterable of function names to start traversal from.
         depth: Number of steps to traverse downstream.
 
@@ -47,27 +233,18 @@ def collect_downstream_calls(
         Set of function names reachable downstream from the start functions,
         excluding the start functions themselves.
     """
-    impacted: Set[str] = set()
-    frontier: Set[str] = set(start_funcs)
-
-    for _ in range(depth):
-        next_frontier: Set[str] = set()
-        for func in frontier:
-            if func in graph:
-                next_frontier.update(graph.successors(func))
-        frontier = next_frontier - impacted
-        impacted.update(frontier)
-
-    return impacted - set(start_funcs)
+    if isinstance(graph, CallGraph) and graph.indexed is not None:
+        return _indexed_bfs(graph.indexed, graph.indexed.fwd_adj, start_funcs, depth)
+    return _bounded_bfs(_adjacency(graph, "downstream"), start_funcs, depth)
 
 
 def collect_upstream_calls(
-    graph: nx.DiGraph, start_funcs: Iterable[str], depth: int
+    graph: GraphLike, start_funcs: Iterable[str], depth: int
 ) -> Set[str]:
     """Traverse predecessors up to `depth` and return collected nodes, excluding seeds.
 
     Args:
-        graph: Directed call graph to traverse.
+        graph: Call graph to traverse (``CallGraph`` or ``nx.DiGraph``).
         start_funcs: Iterable of function names to start traversal from.
         depth: Number of steps to traverse upstream.
 
@@ -75,15 +252,60 @@ def collect_upstream_calls(
         Set of function names reachable upstream from the start functions,
         excluding the start functions themselves.
     """
-    impacted: Set[str] = set()
-    frontier: Set[str] = set(start_funcs)
+    if isinstance(graph, CallGraph) and graph.indexed is not None:
+        return _indexed_bfs(graph.indexed, graph.indexed.rev_adj, start_funcs, depth)
+    return _bounded_bfs(_adjacency(graph, "upstream"), start_funcs, depth)
+
+
+def collect_per_source_calls(
+    graph: GraphLike,
+    sources: Iterable[str],
+    depth: int,
+    direction: Literal["downstream", "upstream"] = "downstream",
+) -> Dict[str, Set[str]]:
+    """Collect the nodes reachable from each source within `depth` in one pass.
+
+    Runs a single multi-source BFS that tags every visited node with the set
+    of sources reaching it, so each (source, node) pair is expanded at most
+    once instead of running a separate traversal per source.
+
+    Args:
+        graph: Call graph to traverse (``CallGraph`` or ``nx.DiGraph``).
+        sources: Iterable of function names to start traversal from.
+        depth: Number of steps to traverse.
+        direction: ``"downstream"`` follows successors (callees),
+                   ``"upstream"`` follows predecessors (callers).
+
+    Returns:
+        Dictionary mapping each source to the set of function names reachable
+        from it, excluding the source itself. Equivalent to calling
+        ``collect_downstream_calls``/``collect_upstream_calls`` per source.
+    """
+    adjacency = _adjacency(graph, direction)
+    source_list = list(dict.fromkeys(sources))
+
+    # node -> sources that reached it; seeds are tagged with themselves so a
+    # cycle back to a source is not reported as its own dependency
+    tags: Dict[str, Set[str]] = {source: {source} for source in source_list}
+    frontier: Dict[str, Set[str]] = {source: {source} for source in source_list}
 
     for _ in range(depth):
-        next_frontier: Set[str] = set()
-        for func in frontier:
-            if func in graph:
-                next_frontier.update(graph.predecessors(func))
-        frontier = next_frontier - impacted
-        impacted.update(frontier)
-
-    return impacted - set(start_funcs)
+        next_frontier: Dict[str, Set[str]] = {}
+        for func, reached_by in frontier.items():
+            for neighbor in adjacency.get(func, ()):
+                seen = tags.setdefault(neighbor, set())
+                new_sources = reached_by - seen
+                if new_sources:
+                    seen |= new_sources
+                    next_frontier.setdefault(neighbor, set()).update(new_sources)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+
+    result: Dict[str, Set[str]] = {source: set() for source in source_list}
+    for func, reached_by in tags.items():
+        for source in reached_by:
+            if source != func:
+                result[source].add(func)
+
+    return result
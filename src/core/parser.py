@@ -1,12 +1,64 @@
 # src/core/parser.py
-from typing import Dict, List, TypedDict
+import os
+import sys
+import threading
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import tree_sitter_c
-from tree_sitter import Language, Parser, Query, QueryCursor
+from tree_sitter import Language, Node, Parser, Query, QueryCursor, Tree
 
 # Create the Language object correctly
 C_LANGUAGE = Language(tree_sitter_c.language())
 
+# Queries are compiled once; compiling dominated parsing of large files
+# when a fresh call query was built for every function body
+_FUNC_NAME_QUERY = Query(
+    C_LANGUAGE,
+    """
+    (function_definition
+        declarator: (function_declarator
+            declarator: (identifier) @func_name))
+    """,
+)
+_FUNC_BODY_QUERY = Query(
+    C_LANGUAGE,
+    """
+    (function_definition
+        declarator: (function_declarator
+            declarator: (identifier) @func_name)
+        body: (compound_statement) @body)
+    """,
+)
+_CALL_QUERY = Query(
+    C_LANGUAGE,
+    """
+    (call_expression
+        function: (identifier) @called_name)
+    """,
+)
+
+# Number of parsed files kept in memory by ``_parse_file``
+PARSE_CACHE_SIZE = 512
+
+# Bounds on the bases kept for incremental reparsing: a base is only used when
+# a long-lived process (library use re-analyzing a working tree after edits)
+# parses a file again after it changed. A CLI run parses each file once, so
+# only a few recent files are kept, and none larger than the byte budget
+REPARSE_BASE_COUNT = 16
+REPARSE_BASE_BYTES = 8 << 20
+
+# path -> (source, tree) of the file's latest parse; once the file changes the
+# old tree seeds an incremental reparse so unchanged subtrees are reused
+_last_parse: Dict[str, Tuple[bytes, Tree]] = {}
+_last_parse_lock = threading.Lock()
+
+# Holds each thread's reusable ``Parser``
+_thread_state = threading.local()
+
+_start_byte = attrgetter("start_byte")
+
 
 def _normalize_name(name: str) -> str:
     """Normalize a function-like identifier to a canonical name.
@@ -20,6 +72,9 @@ def _normalize_name(name: str) -> str:
     Returns:
         Normalized function name with whitespace and trailing parentheses removed.
     """
+    # Captured identifiers are almost always already clean
+    if name.isidentifier():
+        return name
     stripped = name.strip()
     # Remove a single trailing "(" if present (covers "foo(" or "foo (" styles)
     if stripped.endswith("("):
@@ -27,6 +82,182 @@ def _normalize_name(name: str) -> str:
     return stripped
 
 
+def _node_name(node: Node) -> str:
+    """Return the normalized, interned identifier text of a tree-sitter node.
+
+    The text is read from the parser's own copy of the source, so byte
+    offsets stay correct for files containing non-ASCII characters. Names
+    are interned because the same callees recur across every call site.
+
+    Args:
+        node: Identifier node captured by a query.
+
+    Returns:
+        Normalized function name.
+    """
+    raw_name = (node.text or b"").decode("utf-8", errors="replace")
+    return sys.intern(_normalize_name(raw_name))
+
+
+def _parser() -> Parser:
+    """Return this thread's C parser, creating it on first use.
+
+    A parser is not reentrant, so threads mapping files concurrently each
+    keep their own rather than contending for a shared one.
+    """
+    parser = getattr(_thread_state, "parser", None)
+    if parser is None:
+        parser = _thread_state.parser = Parser(C_LANGUAGE)
+    return parser
+
+
+def _parse_source(code: bytes, old_tree: Optional[Tree] = None) -> Tree:
+    """Parse C source bytes into a tree-sitter tree.
+
+    Args:
+        code: Contents of a C source file.
+        old_tree: Earlier tree of the same file, already adjusted with
+                  ``Tree.edit`` to describe how `code` differs from it.
+
+    Returns:
+        The parsed tree.
+    """
+    parser = _parser()
+    if old_tree is None:
+        return parser.parse(code)
+    return parser.parse(code, old_tree)
+
+
+def _point(source: bytes, offset: int) -> Tuple[int, int]:
+    """Return the (row, column) tree-sitter point of a byte offset."""
+    row = source.count(b"\n", 0, offset)
+    return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+
+def _edited_tree(old_source: bytes, old_tree: Tree, new_source: bytes) -> Tree:
+    """Return a copy of `old_tree` edited to span `new_source`.
+
+    The edit covers the single byte range between the longest common prefix
+    and suffix of the two sources, which is exact for one contiguous change
+    and a conservative superset for several.
+
+    Args:
+        old_source: Source `old_tree` was parsed from.
+        old_tree: Tree of `old_source`; left untouched.
+        new_source: Current source of the same file.
+
+    Returns:
+        Edited copy of `old_tree`, ready to pass to ``_parse_source``.
+    """
+    old_view, new_view = memoryview(old_source), memoryview(new_source)
+    limit = min(len(old_source), len(new_source))
+
+    # Binary searches over memcmp-backed slice comparisons
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old_view[:mid] == new_view[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    start = low
+
+    low, high = 0, limit - start
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old_view[len(old_source) - mid :] == new_view[len(new_source) - mid :]:
+            low = mid
+        else:
+            high = mid - 1
+    old_end, new_end = len(old_source) - low, len(new_source) - low
+
+    tree = old_tree.copy()
+    tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point(old_source, start),
+        old_end_point=_point(old_source, old_end),
+        new_end_point=_point(new_source, new_end),
+    )
+    return tree
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_file(file_path: str, mtime_ns: int, size: int) -> Tree:
+    """Parse a C file; memoized on the file's stat so edits are picked up.
+
+    A file that changed since its previous parse is reparsed incrementally
+    from the earlier tree, if that tree is still among the most recent
+    ``REPARSE_BASE_COUNT`` bases kept.
+
+    Args:
+        file_path: Path to the C source file to parse.
+        mtime_ns: Modification time of the file, in nanoseconds.
+        size: Size of the file in bytes.
+
+    Returns:
+        The parsed tree, which also holds the source bytes.
+    """
+    with open(file_path, "rb") as f:
+        source = f.read()
+
+    with _last_parse_lock:
+        previous = _last_parse.pop(file_path, None)
+    if previous is None:
+        tree = _parse_source(source)
+    elif previous[0] == source:
+        tree = previous[1]
+    else:
+        tree = _parse_source(source, _edited_tree(*previous, source))
+
+    # The tree references the same source, so a base costs memory only once
+    # its tree has left the lru cache; oldest bases are dropped first
+    if len(source) <= REPARSE_BASE_BYTES:
+        with _last_parse_lock:
+            _last_parse[file_path] = (source, tree)
+            while len(_last_parse) > REPARSE_BASE_COUNT or (
+                sum(len(base) for base, _ in _last_parse.values()) > REPARSE_BASE_BYTES
+            ):
+                del _last_parse[next(iter(_last_parse))]
+    return tree
+
+
+def _parse_path(file_path: str) -> Tree:
+    """Return the parsed tree of a C file, reusing it if the file is unchanged.
+
+    Args:
+        file_path: Path to the C source file to parse.
+
+    Returns:
+        The parsed tree.
+    """
+    # Spellings of one path share an entry; abspath needs no filesystem walk
+    # unlike resolve(), and the key stays valid if the working directory changes
+    abs_path = os.path.abspath(file_path)
+    st = os.stat(abs_path)
+    return _parse_file(abs_path, st.st_mtime_ns, st.st_size)
+
+
+def _in_source_order(captures: Dict[str, List[Node]], name: str) -> List[Node]:
+    """Return the nodes captured under `name`, sorted by position.
+
+    ``QueryCursor.captures`` groups nodes by capture name in one pass, but
+    nested matches (such as calls used as arguments) are not in source order.
+    """
+    return sorted(captures.get(name, ()), key=_start_byte)
+
+
+def _definition_of(name_node: Node) -> Optional[Node]:
+    """Return the ``function_definition`` of a captured function name.
+
+    The queries only capture identifiers that are the declarator of a
+    ``function_declarator`` that is itself the declarator of the definition.
+    """
+    declarator = name_node.parent
+    return declarator.parent if declarator is not None else None
+
+
 def get_functions(file_path: str) -> List[str]:
     """Return all function names defined in a C source file.
 
@@ -36,33 +267,32 @@ def get_functions(file_path: str) -> List[str]:
     Returns:
         List of normalized function names found in the file.
     """
-    parser = Parser()
-    parser.language = C_LANGUAGE
+    return _functions(_parse_path(file_path))
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-    tree = parser.parse(code.encode("utf-8"))
 
-    query = Query(
-        C_LANGUAGE,
-        """
-        (function_definition
-            declarator: (function_declarator
-                declarator: (identifier) @func_name))
-        """,
-    )
+def get_functions_from_source(code: bytes) -> List[str]:
+    """Return all function names defined in C source code.
 
-    cursor = QueryCursor(query)
-    matches = cursor.matches(tree.root_node)
+    Args:
+        code: Contents of a C source file.
+
+    Returns:
+        List of normalized function names found in the source.
+    """
+    return _functions(_parse_source(code))
 
-    function_names: List[str] = []
-    for _, captures_dict in matches:
-        if "func_name" in captures_dict:
-            for node in captures_dict["func_name"]:
-                raw_name = code[node.start_byte : node.end_byte]
-                function_names.append(_normalize_name(raw_name))
 
-    return function_names
+def _functions(tree: Tree) -> List[str]:
+    """Return all function names defined in a parsed C source file.
+
+    Args:
+        tree: Parsed C source file.
+
+    Returns:
+        List of normalized function names found in the tree.
+    """
+    captures = QueryCursor(_FUNC_NAME_QUERY).captures(tree.root_node)
+    return [_node_name(node) for node in _in_source_order(captures, "func_name")]
 
 
 def get_function_calls(file_path: str) -> Dict[str, List[str]]:
@@ -74,58 +304,55 @@ def get_function_calls(file_path: str) -> Dict[str, List[str]]:
     Returns:
         Dictionary mapping function names to lists of functions they call.
     """
-    parser = Parser()
-    parser.language = C_LANGUAGE
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-    tree = parser.parse(code.encode("utf-8"))
-
-    func_query = Query(
-        C_LANGUAGE,
-        """
-        (function_definition
-            declarator: (function_declarator
-                declarator: (identifier) @func_name)
-            body: (compound_statement) @body)
-        """,
-    )
+    return _function_calls(_parse_path(file_path))
 
-    func_cursor = QueryCursor(func_query)
-    func_matches = func_cursor.matches(tree.root_node)
 
-    call_map: Dict[str, List[str]] = {}
-    for _, captures_dict in func_matches:
-        if "func_name" in captures_dict and "body" in captures_dict:
-            func_node = captures_dict["func_name"][0]
-            body_node = captures_dict["body"][0]
-            func_name = _normalize_name(code[func_node.start_byte : func_node.end_byte])
-
-            call_query = Query(
-                C_LANGUAGE,
-                """
-                (call_expression
-                    function: (identifier) @called_name)
-                """,
-            )
+def get_function_calls_from_source(code: bytes) -> Dict[str, List[str]]:
+    """Return mapping of function -> list of function names it calls.
+
+    Args:
+        code: Contents of a C source file.
+
+    Returns:
+        Dictionary mapping function names to lists of functions they call.
+    """
+    return _function_calls(_parse_source(code))
+
 
-            call_cursor = QueryCursor(call_query)
-            call_matches = call_cursor.matches(body_node)
+def _function_calls(tree: Tree) -> Dict[str, List[str]]:
+    """Return mapping of function -> list of function names it calls.
 
-            called_funcs: List[str] = []
-            for _, call_captures_dict in call_matches:
-                if "called_name" in call_captures_dict:
-                    for called_node in call_captures_dict["called_name"]:
-                        called_raw = code[called_node.start_byte : called_node.end_byte]
-                        called_funcs.append(_normalize_name(called_raw))
+    Args:
+        tree: Parsed C source file.
+
+    Returns:
+        Dictionary mapping function names to lists of functions they call.
+    """
+    captures = QueryCursor(_FUNC_BODY_QUERY).captures(tree.root_node)
+    # One cursor serves every function body; each captures() call restarts it
+    call_cursor = QueryCursor(_CALL_QUERY)
 
-            call_map[func_name] = called_funcs
+    call_map: Dict[str, List[str]] = {}
+    for func_node in _in_source_order(captures, "func_name"):
+        definition = _definition_of(func_node)
+        body_node = definition and definition.child_by_field_name("body")
+        if body_node is None:
+            continue
+        call_captures = call_cursor.captures(body_node)
+        call_map[_node_name(func_node)] = [
+            _node_name(called_node)
+            for called_node in _in_source_order(call_captures, "called_name")
+        ]
 
     return call_map
 
 
-class FunctionNode(TypedDict):
-    """Description of a function's location in a C file."""
+class FunctionNode(NamedTuple):
+    """Description of a function's location in a C file.
+
+    A tuple rather than a dict: files can define thousands of functions and a
+    three-field tuple is a fraction of a dict's size.
+    """
 
     name: str
     start: int
@@ -139,52 +366,48 @@ def get_function_nodes(file_path: str) -> List[FunctionNode]:
         file_path: Path to the C source file to parse.
 
     Returns:
-        List of FunctionNode dictionaries, each containing the function name,
+        List of FunctionNode tuples, each holding the function name,
         start line number, and end line number.
     """
-    parser = Parser()
-    parser.language = C_LANGUAGE
+    return _function_nodes(_parse_path(file_path))
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-    tree = parser.parse(code.encode("utf-8"))
 
-    query = Query(
-        C_LANGUAGE,
-        """
-        (function_definition
-            declarator: (function_declarator
-                declarator: (identifier) @func_name)) @func_def
-        """,
-    )
-    cursor = QueryCursor(query)
-    matches = cursor.matches(tree.root_node)
+def get_function_nodes_from_source(code: bytes) -> List[FunctionNode]:
+    """Return function names with start/end line numbers for C source code.
+
+    Args:
+        code: Contents of a C source file.
+
+    Returns:
+        List of FunctionNode tuples, each holding the function name,
+        start line number, and end line number.
+    """
+    return _function_nodes(_parse_source(code))
+
+
+def _function_nodes(tree: Tree) -> List[FunctionNode]:
+    """Return function names with start/end line numbers for a parsed C file.
+
+    Args:
+        tree: Parsed C source file.
+
+    Returns:
+        List of FunctionNode tuples, each holding the function name,
+        start line number, and end line number.
+    """
+    captures = QueryCursor(_FUNC_NAME_QUERY).captures(tree.root_node)
 
     functions: List[FunctionNode] = []
-    for _, captures_dict in matches:
-        if "func_name" in captures_dict and "func_def" in captures_dict:
-            func_name_nodes = captures_dict["func_name"]
-            func_def_nodes = captures_dict["func_def"]
-
-            # Match function names to their definitions
-            for func_name_node in func_name_nodes:
-                func_name = _normalize_name(
-                    code[func_name_node.start_byte : func_name_node.end_byte]
-                )
-
-                # Find the corresponding function definition node
-                for func_def_node in func_def_nodes:
-                    # Check if this function definition contains our function name
-                    if (
-                        func_def_node.start_byte <= func_name_node.start_byte
-                        and func_name_node.end_byte <= func_def_node.end_byte
-                    ):
-                        start_line = (
-                            func_def_node.start_point[0] + 1
-                        )  # Tree-sitter lines start at 0
-                        end_line = func_def_node.end_point[0] + 1
-                        functions.append(
-                            {"name": func_name, "start": start_line, "end": end_line}
-                        )
-                        break
+    for func_name_node in _in_source_order(captures, "func_name"):
+        func_def_node = _definition_of(func_name_node)
+        if func_def_node is None:
+            continue
+        functions.append(
+            FunctionNode(
+                _node_name(func_name_node),
+                # Tree-sitter lines start at 0
+                func_def_node.start_point[0] + 1,
+                func_def_node.end_point[0] + 1,
+            )
+        )
     return functions
@@ -2,7 +2,13 @@
 """JSON output schema and serialization for ImpactScope analysis results."""
 
 import json
-from typing import Dict, List, Set
+import sys
+from typing import Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None  # type: ignore[assignment]
 
 # JSON schema version for future compatibility
 JSON_SCHEMA_VERSION = "1.0.0"
@@ -10,9 +16,9 @@ JSON_SCHEMA_VERSION = "1.0.0"
 
 def generate_impact_json(
     file: str,
-    changed_functions: List[str],
-    downstream: Set[str],
-    upstream: Set[str],
+    changed_functions: Iterable[str],
+    downstream: Iterable[str],
+    upstream: Iterable[str],
     depth: int,
     changed_lines: List[tuple[int, int]] | None = None,
 ) -> Dict[str, str | List[str] | int | List[Dict[str, int]]]:
@@ -32,8 +38,8 @@ def generate_impact_json(
     result: Dict[str, str | List[str] | int | List[Dict[str, int]]] = {
         "file": file,
         "changed_functions": sorted(changed_functions),
-        "downstream": sorted(list(downstream)),
-        "upstream": sorted(list(upstream)),
+        "downstream": sorted(downstream),
+        "upstream": sorted(upstream),
         "depth": depth,
     }
 
@@ -79,4 +85,12 @@ def print_json_output(data: Dict) -> None:
     Args:
         data: The JSON-serializable dictionary to output.
     """
+    buffer = getattr(sys.stdout, "buffer", None)
+    if orjson is not None and buffer is not None:
+        # Same layout as json.dumps(indent=2, ensure_ascii=False), written as
+        # UTF-8 bytes without a str round-trip; flush pending text first
+        sys.stdout.flush()
+        buffer.write(orjson.dumps(data, option=orjson.OPT_INDENT_2) + b"\n")
+        buffer.flush()
+        return
     print(json.dumps(data, indent=2, ensure_ascii=False))
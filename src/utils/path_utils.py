@@ -1,10 +1,50 @@
-# src/core/path_utils.py
+# src/utils/path_utils.py
 """Cross-platform path utilities for ImpactScope."""
 
+import os
 import re
+from functools import lru_cache
 from pathlib import Path
 
+# Windows invalid: < > : " / \ | ? *
+# All platforms: null bytes, control characters
+# A translation table maps them in one C-level pass, cheaper than a regex
+# on short names
+_INVALID_TRANS = str.maketrans(
+    {**{c: "_" for c in '<>:"/\\|?*'}, **{chr(i): "_" for i in range(32)}}
+)
+_UNDERS = re.compile(r"_{2,}")
+
+# Device names Windows reserves regardless of extension
+_RESERVED = frozenset(
+    {
+        "CON",
+        "PRN",
+        "AUX",
+        "NUL",
+        "COM1",
+        "COM2",
+        "COM3",
+        "COM4",
+        "COM5",
+        "COM6",
+        "COM7",
+        "COM8",
+        "COM9",
+        "LPT1",
+        "LPT2",
+        "LPT3",
+        "LPT4",
+        "LPT5",
+        "LPT6",
+        "LPT7",
+        "LPT8",
+        "LPT9",
+    }
+)
 
+
+@lru_cache(maxsize=1024)
 def sanitize_filename(name: str) -> str:
     """Sanitize a string to be safe for use as a filename across all platforms.
 
@@ -23,13 +63,11 @@ def sanitize_filename(name: str) -> str:
     sanitized = name.strip(" .")
 
     # Replace invalid characters with underscore
-    # Windows invalid: < > : " / \ | ? *
-    # All platforms: null bytes, control characters
-    invalid_chars = r'[<>:"/\\|?*\x00-\x1f]'
-    sanitized = re.sub(invalid_chars, "_", sanitized)
+    sanitized = sanitized.translate(_INVALID_TRANS)
 
     # Replace multiple consecutive underscores with a single one
-    sanitized = re.sub(r"_+", "_", sanitized)
+    if "__" in sanitized:
+        sanitized = _UNDERS.sub("_", sanitized)
 
     # Remove leading/trailing underscores (but keep internal ones)
     sanitized = sanitized.strip("_")
@@ -38,33 +76,10 @@ def sanitize_filename(name: str) -> str:
     if not sanitized:
         sanitized = "unnamed"
 
-    # Check for reserved names (before extension, if any)
-    base_name = sanitized.split(".")[0] if "." in sanitized else sanitized
-    reserved_names = {
-        "CON",
-        "PRN",
-        "AUX",
-        "NUL",
-        "COM1",
-        "COM2",
-        "COM3",
-        "COM4",
-        "COM5",
-        "COM6",
-        "COM7",
-        "COM8",
-        "COM9",
-        "LPT1",
-        "LPT2",
-        "LPT3",
-        "LPT4",
-        "LPT5",
-        "LPT6",
-        "LPT7",
-        "LPT8",
-        "LPT9",
-    }
-    if base_name.upper() in reserved_names:
+    # Check for reserved names (before extension, if any); none is longer
+    # than four characters, so longer bases skip the upper() copy
+    base_name = sanitized.partition(".")[0]
+    if len(base_name) <= 4 and base_name.upper() in _RESERVED:
         sanitized = f"_{sanitized}"
 
     return sanitized
@@ -83,4 +98,20 @@ def get_file_url(path: Path) -> str:
     Returns:
         A file:// URL string.
     """
-    return path.resolve().as_uri()
+    # Absolute paths are already valid URLs; relative ones are joined onto
+    # the working directory
+    if path.is_absolute():
+        return path.as_uri()
+    return _resolved_uri(os.getcwd(), str(path))
+
+
+@lru_cache(maxsize=1024)
+def _resolved_uri(cwd: str, path: str) -> str:
+    """Return the file:// URL of a relative path resolved against ``cwd``.
+
+    Keyed on the working directory as well, so a ``chdir`` never serves a
+    URL resolved against the previous one. ``getcwd`` already returns a
+    canonical directory, so the path is normalized lexically instead of
+    walking the filesystem with ``resolve()``.
+    """
+    return Path(os.path.normpath(os.path.join(cwd, path))).as_uri()
@@ -1,17 +1,47 @@
 # src/visualization/visualization.py
+import os
+import sys
 import webbrowser
+from collections import defaultdict
 from pathlib import Path
-from typing import Iterable, Mapping, Set
+from typing import DefaultDict, Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
 from pyvis.network import Network
 from rich.console import Console
 
-from ..core.call_graph import build_call_graph_from_repo
+from ..core.call_graph import CallGraph, build_call_graph_cached
 from ..core.constants import COLORS, UNIMPORTANT_FUNCS
+from ..core.git_diff import get_head_sha
 from ..utils.path_utils import get_file_url, sanitize_filename
 
 console = Console()
 
+# Graphs with more nodes than this are rendered without physics simulation
+PHYSICS_NODE_LIMIT = 500
+
+# Color, title suffix and size of the node drawn for each category
+_NODE_STYLES: Dict[str, Tuple[str, str, int]] = {
+    "changed": (COLORS["changed"], " (Changed)", 35),
+    "upstream": (COLORS["upstream"], " (Upstream)", 25),
+    "downstream": (COLORS["downstream"], " (Downstream)", 25),
+    "unimportant": (COLORS["unimportant"], " (Unimportant)", 20),
+    "other": (COLORS["other"], "", 20),
+}
+
+
+def _browser_available() -> bool:
+    """Return whether generated graphs should be opened in a browser.
+
+    Setting ``IMPACTSCOPE_NO_BROWSER`` disables it. Outside Windows and macOS
+    a GUI browser needs an X11 or Wayland display; without one (CI, SSH)
+    ``webbrowser`` would only walk its fallback chain of launchers.
+    """
+    if os.environ.get("IMPACTSCOPE_NO_BROWSER"):
+        return False
+    if sys.platform.startswith("win") or sys.platform == "darwin":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
 
 def visualize_call_graph_pyvis(
     call_map: Mapping[str, Iterable[str]],
@@ -23,15 +53,18 @@ def visualize_call_graph_pyvis(
     repo_path: str | None = None,
     commit_hash: str | None = None,
     source_file: str | None = None,
+    graph: Optional[CallGraph] = None,
 ) -> Path:
     """Render an interactive call graph highlighting changed/upstream/downstream calls.
 
     The HTML output is written under ``artifacts/{project_name}/{commit_hash}/call_graphs/``
     with a meaningful filename. JS/CSS resources are loaded from CDNs, so no local
-    ``lib/`` directory is generated. The HTML file is automatically opened in the browser.
+    ``lib/`` directory is generated. The HTML file is automatically opened in the browser
+    unless no display is available or ``IMPACTSCOPE_NO_BROWSER`` is set.
 
     Args:
-        call_map: Mapping of function names to their callees.
+        call_map: Mapping of function names to their callees. It is only read,
+                  never mutated, so read-only views may be passed.
         changed_funcs: Set of function names that were directly changed.
         upstream_funcs: Set of functions that call into the changed functions.
         downstream_funcs: Set of functions called by the changed functions.
@@ -40,6 +73,9 @@ def visualize_call_graph_pyvis(
         repo_path: Path to the repository being analyzed (used to extract project name).
         commit_hash: Commit hash being analyzed (used in filename and path).
         source_file: Source file path (used in filename for disambiguation).
+        graph: Call graph of the repository. Defaults to the graph of
+               ``repo_path`` (or the current directory) at its ``HEAD``,
+               built once per process and reused by later calls.
 
     Returns:
         Path to the generated HTML file.
@@ -51,70 +87,92 @@ def visualize_call_graph_pyvis(
     if downstream_funcs is None:
         downstream_funcs = set()
 
-    graph = build_call_graph_from_repo(".")
+    if graph is None:
+        root = repo_path or "."
+        graph = build_call_graph_cached(root, get_head_sha(root))
+    # Edges this view adds to the shared graph: the file's own calls and a
+    # link from each upstream function to the changed ones. They are kept
+    # beside the graph instead of merged into a copy of it, which would cost
+    # a pass over every edge of the repository per rendered file
+    extra_fwd: DefaultDict[str, Set[str]] = defaultdict(set)
+    extra_rev: DefaultDict[str, Set[str]] = defaultdict(set)
     for caller, callees in call_map.items():
         for callee in callees:
-            graph.add_edge(caller, callee)
-
+            extra_fwd[caller].add(callee)
+            extra_rev[callee].add(caller)
     for up_func in upstream_funcs:
+        extra_fwd[up_func] |= changed_funcs
         for changed_func in changed_funcs:
-            if not graph.has_edge(up_func, changed_func):
-                graph.add_edge(up_func, changed_func)
-
-    def bfs_nodes(start_nodes: Set[str], direction: str = "down") -> Set[str]:
-        visited: Set[str] = set()
-        queue: list[tuple[str, int]] = [(node, 0) for node in start_nodes]
-        result: Set[str] = set()
-
-        while queue:
-            node, d = queue.pop(0)
-            if node in visited or d > depth:
-                continue
-            visited.add(node)
-            result.add(node)
-            neighbors = (
-                graph.successors(node)
-                if direction == "down"
-                else graph.predecessors(node)
+            extra_rev[changed_func].add(up_func)
+
+    def within_depth(
+        adjacency: Mapping[str, Iterable[str]], extra: Mapping[str, Set[str]]
+    ) -> Set[str]:
+        """Return nodes within `depth` hops of the changed functions."""
+        visited = set(changed_funcs)
+        frontier = visited
+        for _ in range(depth):
+            # Changed functions without calls are not nodes of the graph
+            frontier = set().union(
+                *[adjacency.get(n, ()) for n in frontier],
+                *[extra.get(n, ()) for n in frontier],
             )
-            for n in neighbors:
-                queue.append((n, d + 1))
-        return result
-
-    nodes_to_include = set(changed_funcs)
-    nodes_to_include |= bfs_nodes(changed_funcs, direction="down")
-    nodes_to_include |= bfs_nodes(changed_funcs, direction="up")
-
-    net = Network(height="800px", width="100%", bgcolor="#222222", font_color="white")
+            frontier -= visited
+            if not frontier:
+                break
+            visited |= frontier
+        return visited
+
+    nodes_to_include = within_depth(graph.fwd, extra_fwd) | within_depth(
+        graph.rev, extra_rev
+    )
+
+    net = Network(
+        height="800px",
+        width="100%",
+        bgcolor="#222222",
+        font_color="white",
+        cdn_resources="remote",
+    )
     net.force_atlas_2based()
-
-    for node in nodes_to_include:
-        if node in changed_funcs:
-            color = COLORS["changed"]
-            title_text = f"{node} (Changed)"
-            size = 35
-        elif node in upstream_funcs:
-            color = COLORS["upstream"]
-            title_text = f"{node} (Upstream)"
-            size = 25
-        elif node in downstream_funcs:
-            color = COLORS["downstream"]
-            title_text = f"{node} (Downstream)"
-            size = 25
-        elif node in UNIMPORTANT_FUNCS:
-            color = COLORS["unimportant"]
-            title_text = f"{node} (Unimportant)"
-            size = 20
-        else:
-            color = COLORS["other"]
-            title_text = f"{node}"
-            size = 20
-
-        net.add_node(node, label=node, color=color, title=title_text, size=size)
-
-    for source, target in graph.edges():
-        if source in nodes_to_include and target in nodes_to_include:
-            net.add_edge(source, target, color="lightgray", arrows="to")
+    if len(nodes_to_include) > PHYSICS_NODE_LIMIT:
+        # Simulating physics and dynamic edge smoothing (an invisible support
+        # node per edge) stalls the browser on large graphs
+        net.toggle_physics(False)
+        net.set_edge_smooth("discrete")
+
+    # Later assignments win, so categories are filled lowest precedence first:
+    # changed > upstream > downstream > unimportant > other
+    category: Dict[str, str] = {}
+    for name, members in (
+        ("unimportant", UNIMPORTANT_FUNCS),
+        ("downstream", downstream_funcs),
+        ("upstream", upstream_funcs),
+        ("changed", changed_funcs),
+    ):
+        category.update(dict.fromkeys(nodes_to_include & members, name))
+
+    # Collect node attributes column-wise and hand them to pyvis in one batch
+    node_ids = list(nodes_to_include)
+    colors: List[str] = []
+    titles: List[str] = []
+    sizes: List[int] = []
+    for node in node_ids:
+        color, suffix, size = _NODE_STYLES[category.get(node, "other")]
+        colors.append(color)
+        titles.append(node + suffix)
+        sizes.append(size)
+
+    net.add_nodes(node_ids, label=node_ids, color=colors, title=titles, size=sizes)
+
+    # Only the adjacency of included nodes is walked; an edge present in both
+    # the graph and the extra edges is drawn once
+    for source in node_ids:
+        targets = dict.fromkeys(graph.fwd.get(source, ()))
+        targets.update(dict.fromkeys(extra_fwd.get(source, ())))
+        for target in targets:
+            if target in nodes_to_include:
+                net.add_edge(source, target, color="lightgray", arrows="to")
 
     # Organize artifacts by project and commit for better structure
     # Extract project name from repo_path (last folder name)
@@ -146,14 +204,24 @@ def visualize_call_graph_pyvis(
 
     out_path = artifacts_base / filename
 
-    # Use CDN resources to avoid creating a local lib/ directory.
-    net.write_html(str(out_path), local=False)
+    # Render the template once and write it in a single buffered call;
+    # write_html would also copy pyvis' lib/ tree into the working directory
+    # unless resources come from the CDN
+    html = net.generate_html()
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as out:
+        out.write(html)
 
     # Automatically open the HTML file in the default browser
+    if not _browser_available():
+        console.print(
+            f"[bold green]Interactive call graph saved: {out_path}[/bold green]"
+        )
+        return out_path
+
     try:
         # Use pathlib's as_uri() for cross-platform file:// URLs
         file_url = get_file_url(out_path)
-        webbrowser.open(file_url)
+        webbrowser.open(file_url, new=0, autoraise=False)
         console.print(
             f"[bold green]Interactive call graph saved and opened: {out_path}[/bold green]"
         )
@@ -0,0 +1,27 @@
+# tests/conftest.py
+"""Shared pytest fixtures."""
+
+from itertools import count
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def c_file_factory(tmp_path_factory) -> Callable[[str], Path]:
+    """Return a function writing C source to a fresh file in a session directory.
+
+    Every call gets its own file name, so parse caches keyed on the path never
+    see stale contents; pytest removes the directory after the session.
+    """
+    directory = tmp_path_factory.mktemp("c")
+    numbers = count()
+
+    def create(content: str) -> Path:
+        file_path = directory / f"t{next(numbers)}.c"
+        # Encoded in one call; the text layer's incremental encoder is skipped
+        file_path.write_bytes(content.encode("utf-8"))
+        return file_path
+
+    return create
@@ -0,0 +1,243 @@
+# tests/test_call_graph.py
+"""Unit tests for the call graph module."""
+
+import multiprocessing
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.core import call_graph
+from src.core.call_graph import (
+    build_call_graph_cached,
+    build_call_graph_from_repo,
+    callmap_cache_dir,
+    default_max_workers,
+    to_networkx,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path_factory, monkeypatch):
+    """Keep the on-disk call-map cache out of the user's home directory."""
+    cache_root = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("IMPACTSCOPE_CACHE_DIR", str(cache_root))
+    return cache_root
+
+
+def write_repo(root: Path) -> None:
+    """Populate ``root`` with a small multi-file C project."""
+    (root / "src").mkdir()
+    (root / "src" / "main.c").write_text(
+        """int main() {
+    init();
+    run();
+    return 0;
+}
+"""
+    )
+    (root / "src" / "run.c").write_text(
+        """void run() {
+    step();
+}
+
+void step() {
+    printf("step");
+}
+"""
+    )
+    (root / "README.md").write_text("# not C\n")
+
+
+class TestBuildCallGraphFromRepo:
+    """Test repository-wide call graph construction."""
+
+    def test_serial_build(self, tmp_path):
+        """Test building the graph without worker processes."""
+        write_repo(tmp_path)
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert graph.fwd == {
+            "main": ["init", "run"],
+            "run": ["step"],
+            "step": ["printf"],
+        }
+        assert graph.rev == {
+            "init": ["main"],
+            "run": ["main"],
+            "step": ["run"],
+            "printf": ["step"],
+        }
+
+    def test_parallel_build_matches_serial(self, tmp_path):
+        """Test that the process pool produces the same graph as serial parsing."""
+        write_repo(tmp_path)
+        serial = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        parallel = build_call_graph_from_repo(str(tmp_path), max_workers=2)
+        assert parallel == serial
+
+    @pytest.mark.skipif(
+        multiprocessing.get_context().get_start_method() != "fork",
+        reason="workers are only forked from the parent with the fork start method",
+    )
+    def test_workers_forked_before_prefetch_threads(self, tmp_path):
+        """Test parser processes are never forked from a multi-threaded parent."""
+        write_repo(tmp_path)
+        thread_counts = []
+        os.register_at_fork(
+            before=lambda: thread_counts.append(threading.active_count())
+        )
+
+        build_call_graph_from_repo(str(tmp_path), max_workers=2, use_cache=False)
+        assert thread_counts
+        assert set(thread_counts) == {threading.active_count()}
+
+    def test_empty_repo(self, tmp_path):
+        """Test a repository without C files."""
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=2)
+        assert (graph.fwd, graph.rev, graph.file_edges) == ({}, {}, {})
+
+    def test_duplicate_edges_collapsed(self, tmp_path):
+        """Test repeated calls to the same callee produce a single edge."""
+        (tmp_path / "a.c").write_text("void a() {\n    b();\n    b();\n    c();\n}\n")
+        (tmp_path / "b.c").write_text("void d() {\n    b();\n}\n")
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert graph.fwd["a"] == ["b", "c"]
+        assert sorted(graph.rev["b"]) == ["a", "d"]
+
+    def test_file_edges_keyed_by_relative_path(self, tmp_path):
+        """Test per-file call edges are retained under repo-relative paths."""
+        write_repo(tmp_path)
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert graph.file_edges == {
+            "src/main.c": [("main", "init"), ("main", "run")],
+            "src/run.c": [("run", "step"), ("step", "printf")],
+        }
+
+    def test_warm_build_served_from_cache(self, tmp_path, monkeypatch):
+        """Test a rebuild of unchanged files reads cache entries, not sources."""
+        write_repo(tmp_path)
+        cold = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+
+        def fail(_source):
+            raise AssertionError("file should not be re-parsed")
+
+        monkeypatch.setattr(call_graph, "get_function_calls_from_source", fail)
+        assert build_call_graph_from_repo(str(tmp_path), max_workers=1) == cold
+
+    def test_parallel_build_with_mixed_cache_hits(self, tmp_path):
+        """Test order is preserved when only some files are cached."""
+        for i in range(12):
+            (tmp_path / f"f{i:02}.c").write_text(f"void f{i}() {{\n    g{i}();\n}}\n")
+        serial = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+
+        for i in range(0, 12, 3):
+            (tmp_path / f"f{i:02}.c").write_text(f"void f{i}() {{\n    h{i}();\n}}\n")
+        expected = build_call_graph_from_repo(
+            str(tmp_path), max_workers=1, use_cache=False
+        )
+        parallel = build_call_graph_from_repo(str(tmp_path), max_workers=2)
+        assert parallel == expected
+        assert parallel != serial
+
+    def test_skip_dirs_are_pruned(self, tmp_path):
+        """Test sources under skipped directories are ignored."""
+        write_repo(tmp_path)
+        for skipped in (".git", "build", "node_modules"):
+            (tmp_path / skipped).mkdir()
+            (tmp_path / skipped / "gen.c").write_text("void gen() {\n    run();\n}\n")
+
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert "gen" not in graph.fwd
+
+        graph = build_call_graph_from_repo(
+            str(tmp_path), max_workers=1, skip_dirs=frozenset()
+        )
+        assert graph.fwd["gen"] == ["run"]
+
+    def test_to_networkx(self, tmp_path):
+        """Test conversion to a NetworkX graph keeps every edge."""
+        write_repo(tmp_path)
+        graph = to_networkx(build_call_graph_from_repo(str(tmp_path), max_workers=1))
+        assert set(graph.edges()) == {
+            ("main", "init"),
+            ("main", "run"),
+            ("run", "step"),
+            ("step", "printf"),
+        }
+
+
+class TestBuildCallGraphCached:
+    """Test in-process memoization of built graphs."""
+
+    def test_same_head_reuses_graph(self, tmp_path, monkeypatch):
+        """Test a second call for the same HEAD does not rebuild."""
+        write_repo(tmp_path)
+        first = build_call_graph_cached(str(tmp_path), "a" * 40)
+
+        def fail(*_args, **_kwargs):
+            raise AssertionError("graph should not be rebuilt")
+
+        monkeypatch.setattr(call_graph, "build_call_graph_from_repo", fail)
+        assert build_call_graph_cached(str(tmp_path / "."), "a" * 40) is first
+
+    def test_new_head_rebuilds(self, tmp_path):
+        """Test a different HEAD produces a fresh graph."""
+        write_repo(tmp_path)
+        first = build_call_graph_cached(str(tmp_path), "a" * 40)
+        second = build_call_graph_cached(str(tmp_path), "b" * 40)
+        assert second is not first
+        assert second == first
+
+
+class TestCallMapCache:
+    """Test the on-disk per-file call-map cache used by graph builds."""
+
+    def test_entry_written_per_file(self, tmp_path):
+        """Test that a build stores one cache entry per parsed file."""
+        (tmp_path / "a.c").write_text("void a() {\n    b();\n}\n")
+        build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert len(list(callmap_cache_dir().glob("*.json"))) == 1
+
+    def test_modified_file_is_reparsed(self, tmp_path):
+        """Test that a size or mtime change invalidates the entry."""
+        c_file = tmp_path / "a.c"
+        c_file.write_text("void a() {\n    b();\n}\n")
+        build_call_graph_from_repo(str(tmp_path), max_workers=1)
+
+        c_file.write_text("void a() {\n    b();\n    c();\n}\n")
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert graph.fwd == {"a": ["b", "c"]}
+
+    def test_corrupt_entry_is_ignored(self, tmp_path):
+        """Test that an unreadable cache entry falls back to parsing."""
+        (tmp_path / "a.c").write_text("void a() {\n    b();\n}\n")
+        build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        for entry in callmap_cache_dir().glob("*.json"):
+            entry.write_bytes(b"{not json")
+
+        graph = build_call_graph_from_repo(str(tmp_path), max_workers=1)
+        assert graph.fwd == {"a": ["b"]}
+
+
+class TestDefaultMaxWorkers:
+    """Test worker count selection."""
+
+    def test_env_override(self, monkeypatch):
+        """Test IMPACTSCOPE_MAX_WORKERS overrides the CPU count."""
+        monkeypatch.setenv("IMPACTSCOPE_MAX_WORKERS", "3")
+        assert default_max_workers() == 3
+
+    @pytest.mark.parametrize("value", ["0", "-2"])
+    def test_env_clamped_to_one(self, monkeypatch, value):
+        """Test non-positive overrides fall back to a single worker."""
+        monkeypatch.setenv("IMPACTSCOPE_MAX_WORKERS", value)
+        assert default_max_workers() == 1
+
+    @pytest.mark.parametrize("value", ["auto", "4.5", "four"])
+    def test_env_invalid_falls_back_to_cpu_count(self, monkeypatch, value):
+        """Test non-integer overrides warn and use the CPU count."""
+        monkeypatch.setenv("IMPACTSCOPE_MAX_WORKERS", value)
+        monkeypatch.setattr(call_graph.os, "cpu_count", lambda: 6)
+        with pytest.warns(RuntimeWarning, match="IMPACTSCOPE_MAX_WORKERS"):
+            assert default_max_workers() == 6
@@ -6,9 +6,54 @@ from pathlib import Path
 from unittest.mock import Mock, patch
 
 import pytest
-from git import BadName
+from git import Actor, BadName, Repo
 
-from src.core.git_diff import get_commit_diff
+from src.core import git_diff
+from src.core.git_diff import get_commit_diff, get_head_sha, iter_commit_diff
+
+
+@pytest.fixture(autouse=True)
+def git_cli_backend(monkeypatch):
+    """Run tests against the git CLI backend unless they select another."""
+    monkeypatch.setattr(git_diff, "pygit2", None)
+    # Mocked and temporary repositories must not leak between tests
+    git_diff._repo.cache_clear()
+    git_diff._pygit2_repo.cache_clear()
+    git_diff._cached_commit_diff.cache_clear()
+
+
+@pytest.fixture(params=["git", "pygit2"])
+def backend(request, monkeypatch):
+    """Select each diff backend in turn, skipping pygit2 when not installed."""
+    if request.param == "pygit2":
+        monkeypatch.setattr(git_diff, "pygit2", pytest.importorskip("pygit2"))
+    return request.param
+
+
+def commit_files(repo: Repo, files: dict, message: str, remove=()) -> str:
+    """Write `files`, delete `remove`, commit everything and return the SHA."""
+    root = Path(repo.working_tree_dir)
+    for name in remove:
+        repo.index.remove([name], working_tree=True)
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content)
+    repo.index.add(list(files))
+    author = Actor("Test", "test@example.com")
+    return repo.index.commit(message, author=author, committer=author).hexsha
+
+
+def run_get_commit_diff(output: bytes, parents: int = 1, commit_hash="abc123"):
+    """Run ``get_commit_diff`` with ``git diff-tree`` mocked to print `output`.
+
+    Returns:
+        The result and the mocked ``diff_tree`` for call assertions.
+    """
+    with patch("src.core.git_diff.Repo") as mock_repo_class:
+        mock_repo = mock_repo_class.return_value
+        mock_repo.commit.return_value.parents = [Mock() for _ in range(parents)]
+        mock_repo.git.diff_tree.return_value = output
+        return get_commit_diff("/fake/path", commit_hash), mock_repo.git.diff_tree
 
 
 class TestGetCommitDiff:
@@ -16,223 +61,102 @@ class TestGetCommitDiff:
 
     def test_valid_commit_with_changes(self):
         """Test parsing a valid commit with C file changes."""
-        # Mock Git objects
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        # Mock diff with C file changes
-        mock_diff = Mock()
-        mock_diff.a_path = "src/main.c"
-        mock_diff.b_path = "src/main.c"
-        mock_diff.diff.decode.return_value = """diff --git a/src/main.c b/src/main.c
+        result, diff_tree = run_get_commit_diff(b"""diff --git a/src/main.c b/src/main.c
 index 1234567..abcdef0 100644
 --- a/src/main.c
 +++ b/src/main.c
-@@ -1,5 +1,5 @@
- #include <stdio.h>
-
- int main() {
+@@ -4 +4 @@ int main() {
 -    printf("hello");
 +    printf("hello world");
-     return 0;
- }
-"""
+""")
 
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
-
-            assert "src/main.c" in result
-            assert result["src/main.c"] == [(4, 4)]
+        assert "src/main.c" in result
+        assert result["src/main.c"] == [(4, 4)]
+        args = diff_tree.call_args.args
+        assert "--unified=0" in args
+        assert "-M" in args
+        # A pathspec would be applied before rename detection
+        assert "--" not in args
 
     def test_commit_with_multiple_hunks(self):
         """Test parsing a commit with multiple change hunks."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "src/utils.c"
-        mock_diff.b_path = "src/utils.c"
-        mock_diff.diff.decode.return_value = """diff --git a/src/utils.c b/src/utils.c
+        result, _ = run_get_commit_diff(b"""diff --git a/src/utils.c b/src/utils.c
 index 1234567..abcdef0 100644
 --- a/src/utils.c
 +++ b/src/utils.c
-@@ -10,3 +10,3 @@
- void foo() {
+@@ -11 +11 @@ void foo() {
 -    return 1;
 +    return 2;
- }
-@@ -20,3 +20,3 @@
- void bar() {
+@@ -21 +21 @@ void bar() {
 -    return 3;
 +    return 4;
- }
-"""
+""")
 
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
-
-            assert "src/utils.c" in result
-            assert set(result["src/utils.c"]) == {(11, 11), (21, 21)}
+        assert "src/utils.c" in result
+        assert set(result["src/utils.c"]) == {(11, 11), (21, 21)}
 
     def test_commit_with_consecutive_changes(self):
         """Test parsing a commit with consecutive changed lines."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "src/main.c"
-        mock_diff.b_path = "src/main.c"
-        mock_diff.diff.decode.return_value = """diff --git a/src/main.c b/src/main.c
+        result, _ = run_get_commit_diff(b"""diff --git a/src/main.c b/src/main.c
 index 1234567..abcdef0 100644
 --- a/src/main.c
 +++ b/src/main.c
-@@ -5,6 +5,6 @@
- int func() {
+@@ -6,3 +6,3 @@ int func() {
 -    printf("line 1");
 -    printf("line 2");
 -    printf("line 3");
 +    printf("modified line 1");
 +    printf("modified line 2");
 +    printf("modified line 3");
-     printf("line 4");
-     return 0;
- }
-"""
-
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
+""")
 
-            assert "src/main.c" in result
-            # Consecutive lines 6, 7, 8 should be grouped into (6, 8)
-            assert result["src/main.c"] == [(6, 8)]
+        assert "src/main.c" in result
+        # Consecutive lines 6, 7, 8 should be grouped into (6, 8)
+        assert result["src/main.c"] == [(6, 8)]
 
     def test_commit_with_header_file_changes(self):
         """Test parsing a commit with header file changes."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "include/utils.h"
-        mock_diff.b_path = "include/utils.h"
-        mock_diff.diff.decode.return_value = """diff --git a/include/utils.h b/include/utils.h
+        result, _ = (
+            run_get_commit_diff(b"""diff --git a/include/utils.h b/include/utils.h
 index 1234567..abcdef0 100644
 --- a/include/utils.h
 +++ b/include/utils.h
-@@ -5,3 +5,3 @@
- #define VERSION "1.0"
+@@ -6 +6 @@
 -#define DEBUG 0
 +#define DEBUG 1
-"""
+""")
+        )
 
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
-
-            assert "include/utils.h" in result
-            assert result["include/utils.h"] == [(6, 6)]
+        assert "include/utils.h" in result
+        assert result["include/utils.h"] == [(6, 6)]
 
     def test_commit_with_no_c_changes(self):
         """Test parsing a commit with no C/C++ file changes."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "README.md"
-        mock_diff.b_path = "README.md"
-        mock_diff.diff.decode.return_value = """diff --git a/README.md b/README.md
-index 1234567..abcdef0 100644
---- a/README.md
-+++ b/README.md
-@@ -1,1 +1,1 @@
--# Project
-+# My Project
-"""
+        result, _ = run_get_commit_diff(b"")
 
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
-
-            assert result == {}
+        assert result == {}
 
     def test_commit_with_mixed_file_types(self):
-        """Test parsing a commit with both C files and other files."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        # C file diff
-        mock_diff_c = Mock()
-        mock_diff_c.a_path = "src/main.c"
-        mock_diff_c.b_path = "src/main.c"
-        mock_diff_c.diff.decode.return_value = """diff --git a/src/main.c b/src/main.c
+        """Test non-C sections are ignored even if git reports them."""
+        result, _ = run_get_commit_diff(b"""diff --git a/src/main.c b/src/main.c
 index 1234567..abcdef0 100644
 --- a/src/main.c
 +++ b/src/main.c
-@@ -1,2 +1,2 @@
- int main() {
+@@ -2 +2 @@ int main() {
 -    return 0;
 +    return 1;
- }
-"""
-
-        # Non-C file diff
-        mock_diff_md = Mock()
-        mock_diff_md.a_path = "README.md"
-        mock_diff_md.b_path = "README.md"
-        mock_diff_md.diff.decode.return_value = """diff --git a/README.md b/README.md
+diff --git a/README.md b/README.md
 index 1234567..abcdef0 100644
 --- a/README.md
 +++ b/README.md
-@@ -1,1 +1,1 @@
+@@ -1 +1 @@
 -# Old
 +# New
-"""
-
-        mock_commit.diff.return_value = [mock_diff_c, mock_diff_md]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "abc123")
+""")
 
-            assert "src/main.c" in result
-            assert result["src/main.c"] == [(2, 2)]
-            assert "README.md" not in result
+        assert "src/main.c" in result
+        assert result["src/main.c"] == [(2, 2)]
+        assert "README.md" not in result
 
     def test_invalid_commit_hash(self):
         """Test error handling for invalid commit hash."""
@@ -246,94 +170,281 @@ index 1234567..abcdef0 100644
 
     def test_initial_commit_no_parents(self):
         """Test handling of initial commit with no parents."""
-        mock_commit = Mock()
-        mock_commit.parents = []  # No parents
-
-        mock_diff = Mock()
-        mock_diff.a_path = "src/main.c"
-        mock_diff.b_path = "src/main.c"
-        mock_diff.diff.decode.return_value = """diff --git a/src/main.c b/src/main.c
+        result, diff_tree = run_get_commit_diff(
+            b"""diff --git a/src/main.c b/src/main.c
 new file mode 100644
 index 0000000..1234567
 --- /dev/null
 +++ b/src/main.c
-@@ -0,0 +1,5 @@
+@@ -0,0 +1,4 @@
 +#include <stdio.h>
 +int main() {
 +    return 0;
 +}
-"""
-
-        mock_commit.diff.return_value = [mock_diff]
-
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
+""",
+            parents=0,
+            commit_hash="initial",
+        )
 
-            result = get_commit_diff("/fake/path", "initial")
-
-            assert "src/main.c" in result
-            assert result["src/main.c"] == [(1, 4)]
+        assert "src/main.c" in result
+        assert result["src/main.c"] == [(1, 4)]
+        assert diff_tree.call_args.args[0] == "--root"
 
     def test_renamed_file(self):
         """Test handling of renamed files."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "old_name.c"
-        mock_diff.b_path = "new_name.c"
-        mock_diff.diff.decode.return_value = """diff --git a/old_name.c b/new_name.c
+        result, _ = run_get_commit_diff(b"""diff --git a/old_name.c b/new_name.c
 similarity index 100%
 rename from old_name.c
 rename to new_name.c
-"""
-
-        mock_commit.diff.return_value = [mock_diff]
+""")
 
-        with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
-
-            result = get_commit_diff("/fake/path", "rename")
-
-            # Should use b_path (new name) for renamed files
-            assert "new_name.c" in result
-            assert result["new_name.c"] == []
+        # Should use the new name for renamed files
+        assert "new_name.c" in result
+        assert result["new_name.c"] == []
 
     def test_deleted_file(self):
         """Test handling of deleted files."""
-        mock_commit = Mock()
-        mock_parent = Mock()
-        mock_commit.parents = [mock_parent]
-
-        mock_diff = Mock()
-        mock_diff.a_path = "deleted.c"
-        mock_diff.b_path = None  # Deleted file
-        mock_diff.diff.decode.return_value = """diff --git a/deleted.c b/deleted.c
+        result, _ = run_get_commit_diff(b"""diff --git a/deleted.c b/deleted.c
 deleted file mode 100644
 index 1234567..0000000
 --- a/deleted.c
 +++ /dev/null
 @@ -1,3 +0,0 @@
- void foo() {
-     return;
- }
-"""
-
-        mock_commit.diff.return_value = [mock_diff]
-
+-void foo() {
+-    return;
+-}
+""")
+
+        # For pure deletions, we don't capture the deleted line ranges
+        # as they represent removed content, not changed content
+        assert "deleted.c" in result
+        assert result["deleted.c"] == []
+
+    def test_mode_change_and_quoted_paths(self):
+        """Test sections without hunks and C-quoted non-ASCII paths."""
+        result, _ = run_get_commit_diff(b"""diff --git a/with space.c b/with space.c
+old mode 100644
+new mode 100755
+diff --git "a/sp\\303\\244ce.c" "b/sp\\303\\244ce.c"
+index 1234567..abcdef0 100644
+--- "a/sp\\303\\244ce.c"
++++ "b/sp\\303\\244ce.c"
+@@ -3 +3 @@
+-a
++b
+""")
+
+        assert result == {"with space.c": [], "sp\u00e4ce.c": [(3, 3)]}
+
+    def test_mixed_deletions_and_additions_grouped(self):
+        """Test deletions, additions and adjacent hunks merge into sorted ranges."""
+        result, _ = run_get_commit_diff(b"""diff --git a/src/main.c b/src/main.c
+--- a/src/main.c
++++ b/src/main.c
+@@ -4,2 +4 @@
+-b
+-c
++C
+@@ -9,1 +8,1 @@
+-x
++X
+@@ -10,1 +8,0 @@
+-y
+@@ -20,1 +19,1 @@
+-z
++Z
+""")
+
+        assert result["src/main.c"] == [(4, 4), (8, 9), (19, 19)]
+
+    def test_crlf_and_lone_cr_lines(self):
+        """Test CRLF line endings and embedded CRs don't shift line numbers."""
+        result, _ = run_get_commit_diff(
+            b"diff --git a/src/main.c b/src/main.c\n"
+            b"--- a/src/main.c\n"
+            b"+++ b/src/main.c\n"
+            b"@@ -2 +2 @@\r\n"
+            b'-    char *s = "a\\rb";\rx\r\n'
+            b'+    char *s = "a\\rb";\ry\r\n'
+            b"@@ -3 +4 @@\r\n"
+            b"-    return 0;\r\n"
+            b"+    return 1;\r\n"
+        )
+
+        assert result["src/main.c"] == [(2, 2), (4, 4)]
+
+    def test_added_line_resembling_hunk_header(self):
+        """Test only real hunk headers are read, not hunk bodies."""
+        result, _ = run_get_commit_diff(b"""diff --git a/src/main.c b/src/main.c
+--- a/src/main.c
++++ b/src/main.c
+@@ -5 +5,2 @@
+-x
++@@ -1 +100 @@
++y
+""")
+
+        assert result["src/main.c"] == [(5, 6)]
+
+
+class TestGetCommitDiffRealRepo:
+    """Test both diff backends against a real repository."""
+
+    def make_repo(self, root: Path) -> Repo:
+        """Create a two-commit repository exercising edits, renames and deletes."""
+        repo = Repo.init(root)
+        lines = [f"line {i}\n" for i in range(1, 13)]
+        commit_files(
+            repo,
+            {
+                "src/a.c": "".join(lines),
+                "src/old.c": "".join(lines),
+                "src/gone.c": "int gone;\n",
+                "README.md": "# readme\n",
+            },
+            "initial",
+        )
+
+        edited = list(lines)
+        edited[2] = "line 3 changed\n"  # line 3 modified
+        del edited[5:7]  # lines 6-7 deleted
+        edited.append("line 13\n")  # appended as new line 11
+        renamed = list(lines)
+        renamed[0] = "line 1 renamed\n"
+        commit_files(
+            repo,
+            {
+                "src/a.c": "".join(edited),
+                "src/new.c": "".join(renamed),
+                "include/inc.h": "#define X 1\n#define Y 2\n",
+                "README.md": "# changed\n",
+            },
+            "change",
+            remove=["src/old.c", "src/gone.c"],
+        )
+        return repo
+
+    def test_head_commit(self, tmp_path, backend):
+        """Test ranges are reported against the new version of each file."""
+        self.make_repo(tmp_path)
+        assert get_commit_diff(str(tmp_path), "HEAD") == {
+            "src/a.c": [(3, 3), (6, 6), (11, 11)],
+            "src/new.c": [(1, 1)],
+            "src/gone.c": [],
+            "include/inc.h": [(1, 2)],
+        }
+
+    def test_root_commit(self, tmp_path, backend):
+        """Test the first commit reports every line of each added file."""
+        self.make_repo(tmp_path)
+        assert get_commit_diff(str(tmp_path), "HEAD~1") == {
+            "src/a.c": [(1, 12)],
+            "src/old.c": [(1, 12)],
+            "src/gone.c": [(1, 1)],
+        }
+
+    def test_unknown_commit(self, tmp_path, backend):
+        """Test unknown refs raise ValueError."""
+        self.make_repo(tmp_path)
+        with pytest.raises(ValueError, match="Commit 'nope' does not exist"):
+            get_commit_diff(str(tmp_path), "nope")
+
+    def test_renames_with_other_file_types(self, tmp_path, backend):
+        """Test C renames are detected next to renamed non-C files."""
+        repo = self.make_repo(tmp_path)
+        body = "".join(f"text {i}\n" for i in range(1, 21))
+        commit_files(repo, {"src/x.c": body, "docs.md": body}, "text")
+        commit_files(repo, {"docs2.md": body}, "rename docs", remove=["docs.md"])
+        sha = commit_files(
+            repo,
+            {"src/y.c": body.replace("text 20", "line 20"), "docs3.md": body},
+            "rename both",
+            remove=["src/x.c", "docs2.md"],
+        )
+
+        assert get_commit_diff(str(tmp_path), "HEAD~1") == {}
+        assert get_commit_diff(str(tmp_path), sha) == {"src/y.c": [(20, 20)]}
+
+    def test_renames_changing_extension(self, tmp_path, backend):
+        """Test renames are detected before C/H files are picked by new path."""
+        repo = self.make_repo(tmp_path)
+        bodies = {
+            name: "".join(f"{name} {i}\n" for i in range(1, 21))
+            for name in ("p", "q", "r")
+        }
+        commit_files(
+            repo,
+            {"src/p.cpp": bodies["p"], "src/q.c": bodies["q"], "src/r.c": bodies["r"]},
+            "sources",
+        )
+        sha = commit_files(
+            repo,
+            {
+                "src/p.c": bodies["p"].replace("p 20", "changed"),
+                "src/q.h": bodies["q"].replace("q 1\n", "changed\n"),
+                "src/r.cpp": bodies["r"].replace("r 5", "changed"),
+            },
+            "rename",
+            remove=["src/p.cpp", "src/q.c", "src/r.c"],
+        )
+
+        assert get_commit_diff(str(tmp_path), sha) == {
+            "src/p.c": [(20, 20)],
+            "src/q.h": [(1, 1)],
+        }
+
+    def test_iter_matches_dict_and_resolves_eagerly(self, tmp_path, backend):
+        """Test streamed pairs equal the dict and bad refs fail before iterating."""
+        self.make_repo(tmp_path)
+        pairs = list(iter_commit_diff(str(tmp_path), "HEAD"))
+
+        assert dict(pairs) == get_commit_diff(str(tmp_path), "HEAD")
+        assert len(pairs) == len(dict(pairs))
+        with pytest.raises(ValueError, match="Commit 'nope' does not exist"):
+            iter_commit_diff(str(tmp_path), "nope")
+
+    def test_diff_memoized_per_commit(self, tmp_path, backend):
+        """Test repeated diffs are cached by SHA, copied out, and follow HEAD."""
+        repo = self.make_repo(tmp_path)
+        first = get_commit_diff(str(tmp_path), "HEAD")
+        first["src/a.c"].append((99, 99))
+
+        assert get_commit_diff(str(tmp_path), "HEAD")["src/a.c"] == [
+            (3, 3),
+            (6, 6),
+            (11, 11),
+        ]
+        assert git_diff._cached_commit_diff.cache_info().hits == 1
+
+        commit_files(repo, {"src/a.c": "int a;\n"}, "third")
+        assert get_commit_diff(str(tmp_path), "HEAD") == {"src/a.c": [(1, 1)]}
+
+    def test_handle_reused_across_commits(self, tmp_path, backend):
+        """Test one repository handle serves later calls and sees new commits."""
+        repo = self.make_repo(tmp_path)
+        get_commit_diff(str(tmp_path), "HEAD")
+        sha = commit_files(repo, {"src/a.c": "int a;\n"}, "third")
+
+        assert get_commit_diff(str(tmp_path), sha) == {"src/a.c": [(1, 1)]}
+        assert get_head_sha(str(tmp_path)) == sha
+        opened = git_diff._pygit2_repo if backend == "pygit2" else git_diff._repo
+        assert opened.cache_info().misses == 1
+
+
+class TestGetHeadSha:
+    """Test resolving the checked-out commit."""
+
+    def test_returns_head_hexsha(self):
+        """Test the SHA of HEAD is returned."""
         with patch("src.core.git_diff.Repo") as mock_repo_class:
-            mock_repo = Mock()
-            mock_repo_class.return_value = mock_repo
-            mock_repo.commit.return_value = mock_commit
+            mock_repo_class.return_value.head.commit.hexsha = "abc123"
+            assert get_head_sha("/fake/path") == "abc123"
 
-            result = get_commit_diff("/fake/path", "delete")
-
-            # For pure deletions, we don't capture the deleted line ranges
-            # as they represent removed content, not changed content
-            assert "deleted.c" in result
-            assert result["deleted.c"] == []
+    def test_unborn_head(self):
+        """Test a repository without commits raises ValueError."""
+        with patch("src.core.git_diff.Repo") as mock_repo_class:
+            type(mock_repo_class.return_value.head).commit = property(
+                Mock(side_effect=ValueError("Reference at 'refs/heads/main'"))
+            )
+            with pytest.raises(ValueError, match="has no checked-out commit"):
+                get_head_sha("/fake/path")
@@ -1,29 +1,26 @@
 # tests/test_impact_mapper.py
 """Unit tests for the impact mapper module."""
 
-import tempfile
-from pathlib import Path
-
 import networkx as nx
 import pytest
 
+from src.core import impact_mapper
+from src.core.call_graph import CallGraph, index_adjacency
 from src.core.impact_mapper import (
     collect_downstream_calls,
+    collect_per_source_calls,
+    collect_reachable_ids,
     collect_upstream_calls,
+    map_all_changes_to_functions,
     map_changes_to_functions,
 )
+from src.core.parser import FunctionNode
 
 
 class TestMapChangesToFunctions:
     """Test mapping changed line ranges to affected functions."""
 
-    def create_test_file(self, content: str) -> Path:
-        """Create a temporary C file with given content."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
-            f.write(content)
-            return Path(f.name)
-
-    def test_single_function_change(self):
+    def test_single_function_change(self, c_file_factory):
         """Test when a single function is modified."""
         content = """void foo() {
     printf("foo");
@@ -33,19 +30,16 @@ void bar() {
     printf("bar");
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            # Change affects foo function (lines 1-3)
-            hunks = [(1, 3)]
-            # Use the actual directory and filename
-            repo_path = str(file_path.parent)
-            file_name = file_path.name
-            impacted = map_changes_to_functions(repo_path, file_name, hunks)
-            assert impacted == ["foo"]
-        finally:
-            file_path.unlink()
-
-    def test_multiple_function_changes(self):
+        file_path = c_file_factory(content)
+        # Change affects foo function (lines 1-3)
+        hunks = [(1, 3)]
+        # Use the actual directory and filename
+        repo_path = str(file_path.parent)
+        file_name = file_path.name
+        impacted = map_changes_to_functions(repo_path, file_name, hunks)
+        assert impacted == ["foo"]
+
+    def test_multiple_function_changes(self, c_file_factory):
         """Test when multiple functions are modified."""
         content = """void foo() {
     printf("foo");
@@ -59,18 +53,15 @@ void baz() {
     printf("baz");
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            # Changes affect both foo and bar
-            hunks = [(1, 3), (5, 7)]
-            repo_path = str(file_path.parent)
-            file_name = file_path.name
-            impacted = map_changes_to_functions(repo_path, file_name, hunks)
-            assert set(impacted) == {"foo", "bar"}
-        finally:
-            file_path.unlink()
-
-    def test_partial_overlap(self):
+        file_path = c_file_factory(content)
+        # Changes affect both foo and bar
+        hunks = [(1, 3), (5, 7)]
+        repo_path = str(file_path.parent)
+        file_name = file_path.name
+        impacted = map_changes_to_functions(repo_path, file_name, hunks)
+        assert set(impacted) == {"foo", "bar"}
+
+    def test_partial_overlap(self, c_file_factory):
         """Test when change affects multiple functions."""
         content = """void foo() {
     printf("hello");
@@ -84,18 +75,15 @@ void baz() {
     printf("test");
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            # Change affects both foo and bar functions
-            hunks = [(1, 6)]
-            repo_path = str(file_path.parent)
-            file_name = file_path.name
-            impacted = map_changes_to_functions(repo_path, file_name, hunks)
-            assert set(impacted) == {"foo", "bar"}
-        finally:
-            file_path.unlink()
-
-    def test_no_function_changes(self):
+        file_path = c_file_factory(content)
+        # Change affects both foo and bar functions
+        hunks = [(1, 6)]
+        repo_path = str(file_path.parent)
+        file_name = file_path.name
+        impacted = map_changes_to_functions(repo_path, file_name, hunks)
+        assert set(impacted) == {"foo", "bar"}
+
+    def test_no_function_changes(self, c_file_factory):
         """Test when changes don't affect any functions."""
         content = """#include <stdio.h>
 
@@ -105,88 +93,156 @@ void foo() {
 
 /* This is a comment */
 """
-        file_path = self.create_test_file(content)
-        try:
-            # Change only affects comment/include
-            hunks = [(1, 2)]
-            repo_path = str(file_path.parent)
-            file_name = file_path.name
-            impacted = map_changes_to_functions(repo_path, file_name, hunks)
-            assert impacted == []
-        finally:
-            file_path.unlink()
-
-    def test_empty_hunks(self):
+        file_path = c_file_factory(content)
+        # Change only affects comment/include
+        hunks = [(1, 2)]
+        repo_path = str(file_path.parent)
+        file_name = file_path.name
+        impacted = map_changes_to_functions(repo_path, file_name, hunks)
+        assert impacted == []
+
+    def test_empty_hunks(self, c_file_factory):
         """Test with empty hunks list."""
         content = """void foo() {
     printf("foo");
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            repo_path = str(file_path.parent)
-            file_name = file_path.name
-            impacted = map_changes_to_functions(repo_path, file_name, [])
-            assert impacted == []
-        finally:
-            file_path.unlink()
+        file_path = c_file_factory(content)
+        repo_path = str(file_path.parent)
+        file_name = file_path.name
+        impacted = map_changes_to_functions(repo_path, file_name, [])
+        assert impacted == []
+
+    def test_nested_and_unsorted_functions(self, tmp_path, monkeypatch):
+        """Test the sweep matches a brute-force overlap check on nested ranges."""
+        (tmp_path / "a.c").write_text("")
+        functions = [
+            FunctionNode("late", 40, 45),
+            FunctionNode("outer", 1, 30),
+            FunctionNode("inner", 5, 8),
+            FunctionNode("mid", 12, 14),
+            FunctionNode("tail", 33, 35),
+        ]
+        monkeypatch.setattr(
+            impact_mapper, "get_function_nodes", lambda _path: list(functions)
+        )
+
+        for hunks in ([(20, 20)], [(6, 6)], [(31, 32)], [(9, 13), (35, 40)]):
+            expected = {
+                func.name
+                for start, end in hunks
+                for func in functions
+                if not (end < func.start or start > func.end)
+            }
+            impacted = map_changes_to_functions(str(tmp_path), "a.c", hunks)
+            assert set(impacted) == expected
+
+        # Hits are reported in source order
+        impacted = map_changes_to_functions(str(tmp_path), "a.c", [(1, 45)])
+        assert impacted == ["outer", "inner", "mid", "tail", "late"]
+
+    def test_name_defined_twice_reported_once(self, tmp_path):
+        """Test a function defined in two preprocessor branches appears once."""
+        (tmp_path / "a.c").write_text(
+            "#ifdef FAST\nint f() {\n  return 1;\n}\n#else\n"
+            "int f() {\n  return 2;\n}\n#endif\n"
+        )
+        assert map_changes_to_functions(str(tmp_path), "a.c", [(1, 9)]) == ["f"]
+
+    def test_unchanged_file_extracted_once(self, tmp_path, monkeypatch):
+        """Test function ranges are reused until the file changes."""
+        file_path = tmp_path / "a.c"
+        file_path.write_text("void f() {\n}\n")
+        calls = []
+
+        def get_function_nodes(path):
+            calls.append(path)
+            return [FunctionNode("f", 1, 2)]
+
+        monkeypatch.setattr(impact_mapper, "get_function_nodes", get_function_nodes)
+        assert map_changes_to_functions(str(tmp_path), "a.c", [(1, 1)]) == ["f"]
+        assert map_changes_to_functions(str(tmp_path), "./a.c", [(2, 2)]) == ["f"]
+        assert len(calls) == 1
+
+        file_path.write_text("void f() {\n  return;\n}\n")
+        map_changes_to_functions(str(tmp_path), "a.c", [(1, 1)])
+        assert len(calls) == 2
+
+
+class TestMapAllChangesToFunctions:
+    """Test mapping every file of a diff on a thread pool."""
+
+    def test_matches_per_file_mapping(self, tmp_path):
+        """Test threaded results equal per-file calls and keep diff order."""
+        diff = {}
+        for i in range(6):
+            (tmp_path / f"f{i}.c").write_text(
+                f"void a{i}() {{\n}}\n\nvoid b{i}() {{\n}}\n"
+            )
+            diff[f"f{i}.c"] = [(4, 4)] if i % 2 else [(1, 1), (4, 5)]
+
+        result = map_all_changes_to_functions(
+            str(tmp_path), iter(diff.items()), max_workers=4
+        )
+
+        assert list(result) == list(diff)
+        for file, hunks in diff.items():
+            expected = map_changes_to_functions(str(tmp_path), file, hunks)
+            assert sorted(result[file]) == sorted(expected)
+        assert sorted(result["f0.c"]) == ["a0", "b0"]
+
+    def test_empty_diff(self, tmp_path):
+        """Test an empty diff maps to an empty result."""
+        assert map_all_changes_to_functions(str(tmp_path), []) == {}
 
 
 class TestCollectDownstreamCalls:
     """Test downstream call collection (functions called by changed functions)."""
 
-    def create_test_graph(self) -> nx.DiGraph:
-        """Create a test call graph."""
+    @pytest.fixture(scope="class")
+    def graph(self) -> nx.DiGraph:
+        """Build the read-only test call graph once for the class."""
         graph = nx.DiGraph()
         # A -> B -> C -> D
         # A -> E
         # F -> G
-        graph.add_edge("A", "B")
-        graph.add_edge("B", "C")
-        graph.add_edge("C", "D")
-        graph.add_edge("A", "E")
-        graph.add_edge("F", "G")
+        graph.add_edges_from(
+            [("A", "B"), ("B", "C"), ("C", "D"), ("A", "E"), ("F", "G")]
+        )
         return graph
 
-    def test_depth_zero(self):
+    def test_depth_zero(self, graph):
         """Test with depth 0 (no traversal)."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["A"], 0)
         assert result == set()
 
-    def test_depth_one(self):
+    def test_depth_one(self, graph):
         """Test with depth 1."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["A"], 1)
         assert result == {"B", "E"}
 
-    def test_depth_two(self):
+    def test_depth_two(self, graph):
         """Test with depth 2."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["A"], 2)
         assert result == {"B", "E", "C"}
 
-    def test_depth_three(self):
+    def test_depth_three(self, graph):
         """Test with depth 3."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["A"], 3)
         assert result == {"B", "E", "C", "D"}
 
-    def test_multiple_start_functions(self):
+    def test_multiple_start_functions(self, graph):
         """Test with multiple starting functions."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["A", "F"], 1)
         assert result == {"B", "E", "G"}
 
-    def test_no_downstream_calls(self):
+    def test_no_downstream_calls(self, graph):
         """Test function with no downstream calls."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["D"], 1)
         assert result == set()
 
-    def test_nonexistent_function(self):
+    def test_nonexistent_function(self, graph):
         """Test with non-existent starting function."""
-        graph = self.create_test_graph()
         result = collect_downstream_calls(graph, ["Z"], 1)
         assert result == set()
 
@@ -194,57 +250,144 @@ class TestCollectDownstreamCalls:
 class TestCollectUpstreamCalls:
     """Test upstream call collection (functions that call changed functions)."""
 
-    def create_test_graph(self) -> nx.DiGraph:
-        """Create a test call graph."""
+    @pytest.fixture(scope="class")
+    def graph(self) -> nx.DiGraph:
+        """Build the read-only test call graph once for the class."""
         graph = nx.DiGraph()
         # A -> B -> C -> D
         # E -> C
         # F -> G
-        graph.add_edge("A", "B")
-        graph.add_edge("B", "C")
-        graph.add_edge("C", "D")
-        graph.add_edge("E", "C")
-        graph.add_edge("F", "G")
+        graph.add_edges_from(
+            [("A", "B"), ("B", "C"), ("C", "D"), ("E", "C"), ("F", "G")]
+        )
         return graph
 
-    def test_depth_zero(self):
+    def test_depth_zero(self, graph):
         """Test with depth 0 (no traversal)."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["D"], 0)
         assert result == set()
 
-    def test_depth_one(self):
+    def test_depth_one(self, graph):
         """Test with depth 1."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["D"], 1)
         assert result == {"C"}
 
-    def test_depth_two(self):
+    def test_depth_two(self, graph):
         """Test with depth 2."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["D"], 2)
         assert result == {"C", "B", "E"}
 
-    def test_depth_three(self):
+    def test_depth_three(self, graph):
         """Test with depth 3."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["D"], 3)
         assert result == {"C", "B", "E", "A"}
 
-    def test_multiple_start_functions(self):
+    def test_multiple_start_functions(self, graph):
         """Test with multiple starting functions."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["C", "G"], 1)
         assert result == {"B", "E", "F"}
 
-    def test_no_upstream_calls(self):
+    def test_no_upstream_calls(self, graph):
         """Test function with no upstream calls."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["A"], 1)
         assert result == set()
 
-    def test_nonexistent_function(self):
+    def test_nonexistent_function(self, graph):
         """Test with non-existent starting function."""
-        graph = self.create_test_graph()
         result = collect_upstream_calls(graph, ["Z"], 1)
         assert result == set()
+
+
+class TestCallGraphTraversal:
+    """Test traversals over the adjacency-list CallGraph."""
+
+    def create_test_graph(self) -> CallGraph:
+        """Create the A -> B -> C -> D, A -> E, F -> G graph as a CallGraph."""
+        return CallGraph(
+            fwd={"A": ["B", "E"], "B": ["C"], "C": ["D"], "F": ["G"]},
+            rev={"B": ["A"], "E": ["A"], "C": ["B"], "D": ["C"], "G": ["F"]},
+            file_edges={},
+        )
+
+    def test_downstream(self):
+        """Test downstream traversal matches the NetworkX results."""
+        graph = self.create_test_graph()
+        assert collect_downstream_calls(graph, ["A"], 2) == {"B", "E", "C"}
+        assert collect_downstream_calls(graph, ["A", "F"], 1) == {"B", "E", "G"}
+        assert collect_downstream_calls(graph, ["Z"], 1) == set()
+
+    def test_upstream(self):
+        """Test upstream traversal matches the NetworkX results."""
+        graph = self.create_test_graph()
+        assert collect_upstream_calls(graph, ["D"], 3) == {"C", "B", "A"}
+        assert collect_upstream_calls(graph, ["D"], 0) == set()
+
+    def test_per_source(self):
+        """Test the per-source traversal accepts a CallGraph."""
+        graph = self.create_test_graph()
+        result = collect_per_source_calls(graph, ["A", "C"], 1, "downstream")
+        assert result == {"A": {"B", "E"}, "C": {"D"}}
+
+    @pytest.mark.parametrize("depth", [0, 1, 2, 3])
+    def test_indexed_matches_dict_traversal(self, depth):
+        """Test the integer-id traversal returns the same names as the dict BFS."""
+        graph = self.create_test_graph()
+        indexed = graph._replace(indexed=index_adjacency(graph.fwd, graph.rev))
+        for sources in (["A"], ["A", "F"], ["D", "Z"], []):
+            assert collect_downstream_calls(
+                indexed, sources, depth
+            ) == collect_downstream_calls(graph, sources, depth)
+            assert collect_upstream_calls(
+                indexed, sources, depth
+            ) == collect_upstream_calls(graph, sources, depth)
+
+    def test_collect_reachable_ids(self):
+        """Test id traversal excludes seeds and stops at the depth limit."""
+        graph = self.create_test_graph()
+        indexed = index_adjacency(graph.fwd, graph.rev)
+        a_id = indexed.name_to_id["A"]
+        reached = collect_reachable_ids(indexed.fwd_adj, [a_id, a_id], 2)
+        assert sorted(indexed.id_to_name[i] for i in reached) == ["B", "C", "E"]
+
+
+class TestCollectPerSourceCalls:
+    """Test the single-pass per-source traversal."""
+
+    def create_test_graph(self) -> nx.DiGraph:
+        """Create a test call graph with a shared callee and a cycle."""
+        graph = nx.DiGraph()
+        # A -> B -> C -> D
+        # E -> C
+        # C -> A (cycle)
+        # F -> G
+        graph.add_edge("A", "B")
+        graph.add_edge("B", "C")
+        graph.add_edge("C", "D")
+        graph.add_edge("E", "C")
+        graph.add_edge("C", "A")
+        graph.add_edge("F", "G")
+        return graph
+
+    @pytest.mark.parametrize("depth", [0, 1, 2, 3, 4])
+    def test_matches_per_source_downstream(self, depth):
+        """Test results equal one collect_downstream_calls per source."""
+        graph = self.create_test_graph()
+        sources = ["A", "C", "E", "Z"]
+        result = collect_per_source_calls(graph, sources, depth, "downstream")
+        for source in sources:
+            assert result[source] == collect_downstream_calls(graph, [source], depth)
+
+    @pytest.mark.parametrize("depth", [0, 1, 2, 3, 4])
+    def test_matches_per_source_upstream(self, depth):
+        """Test results equal one collect_upstream_calls per source."""
+        graph = self.create_test_graph()
+        sources = ["A", "C", "D", "G"]
+        result = collect_per_source_calls(graph, sources, depth, "upstream")
+        for source in sources:
+            assert result[source] == collect_upstream_calls(graph, [source], depth)
+
+    def test_source_reachable_from_another_source(self):
+        """Test a source is reported when another source reaches it."""
+        graph = self.create_test_graph()
+        result = collect_per_source_calls(graph, ["A", "B"], 1, "downstream")
+        assert result == {"A": {"B"}, "B": {"C"}}
@@ -1,16 +1,25 @@
 # tests/test_parser.py
 """Unit tests for the parser module."""
 
-import tempfile
-from pathlib import Path
+import threading
 
 import pytest
 
+from src.core import parser
 from src.core.parser import (
+    FunctionNode,
+    _edited_tree,
     _normalize_name,
+    _parse_file,
+    _parse_path,
+    _parse_source,
+    _parser,
     get_function_calls,
+    get_function_calls_from_source,
     get_function_nodes,
+    get_function_nodes_from_source,
     get_functions,
+    get_functions_from_source,
 )
 
 
@@ -45,12 +54,6 @@ class TestNormalizeName:
 class TestGetFunctions:
     """Test function extraction from C files."""
 
-    def create_test_file(self, content: str) -> Path:
-        """Create a temporary C file with given content."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
-            f.write(content)
-            return Path(f.name)
-
     def test_simple_function(self):
         """Test extracting a simple function."""
         content = """
@@ -58,12 +61,8 @@ class TestGetFunctions:
             return 0;
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            functions = get_functions(str(file_path))
-            assert "main" in functions
-        finally:
-            file_path.unlink()
+        functions = get_functions_from_source(content.encode("utf-8"))
+        assert "main" in functions
 
     def test_multiple_functions(self):
         """Test extracting multiple functions."""
@@ -80,15 +79,11 @@ class TestGetFunctions:
             printf("hello");
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            functions = get_functions(str(file_path))
-            assert "foo" in functions
-            assert "bar" in functions
-            assert "baz" in functions
-            assert len(functions) == 3
-        finally:
-            file_path.unlink()
+        functions = get_functions_from_source(content.encode("utf-8"))
+        assert "foo" in functions
+        assert "bar" in functions
+        assert "baz" in functions
+        assert len(functions) == 3
 
     def test_nested_function_calls(self):
         """Test functions with nested calls."""
@@ -101,13 +96,9 @@ class TestGetFunctions:
             printf("nested");
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            functions = get_functions(str(file_path))
-            assert "outer" in functions
-            assert "inner" in functions
-        finally:
-            file_path.unlink()
+        functions = get_functions_from_source(content.encode("utf-8"))
+        assert "outer" in functions
+        assert "inner" in functions
 
     def test_no_functions(self):
         """Test file with no function definitions."""
@@ -120,23 +111,29 @@ class TestGetFunctions:
             int value;
         } MyStruct;
         """
-        file_path = self.create_test_file(content)
-        try:
-            functions = get_functions(str(file_path))
-            assert functions == []
-        finally:
-            file_path.unlink()
+        functions = get_functions_from_source(content.encode("utf-8"))
+        assert functions == []
+
+    def test_non_ascii_before_names(self, tmp_path):
+        """Test names after non-ASCII text are not shifted by byte offsets."""
+        file_path = tmp_path / "units.c"
+        file_path.write_bytes(
+            "// Größe in µm\nint größe_µm() { return 0; }\n"
+            "int area() { return 1; }\n".encode("utf-8")
+        )
+        assert get_functions(str(file_path)) == ["größe_µm", "area"]
+
+    def test_from_source_matches_file(self, c_file_factory):
+        """Test parsing source bytes gives the same names as parsing the file."""
+        content = "void foo() {}\nstatic int bar(int x) { return x; }\n"
+        file_path = c_file_factory(content)
+        assert get_functions_from_source(content.encode("utf-8")) == ["foo", "bar"]
+        assert get_functions(str(file_path)) == ["foo", "bar"]
 
 
 class TestGetFunctionCalls:
     """Test function call extraction."""
 
-    def create_test_file(self, content: str) -> Path:
-        """Create a temporary C file with given content."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
-            f.write(content)
-            return Path(f.name)
-
     def test_simple_function_calls(self):
         """Test extracting simple function calls."""
         content = """
@@ -149,15 +146,11 @@ class TestGetFunctionCalls:
             printf("hello");
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            calls = get_function_calls(str(file_path))
-            assert "foo" in calls
-            assert "bar" in calls
-            assert calls["foo"] == ["bar", "baz"]
-            assert calls["bar"] == ["printf"]
-        finally:
-            file_path.unlink()
+        calls = get_function_calls_from_source(content.encode("utf-8"))
+        assert "foo" in calls
+        assert "bar" in calls
+        assert calls["foo"] == ["bar", "baz"]
+        assert calls["bar"] == ["printf"]
 
     def test_nested_calls(self):
         """Test nested function calls."""
@@ -173,13 +166,9 @@ class TestGetFunctionCalls:
             helper();
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            calls = get_function_calls(str(file_path))
-            assert calls["outer"] == ["inner", "printf"]
-            assert calls["inner"] == ["helper"]
-        finally:
-            file_path.unlink()
+        calls = get_function_calls_from_source(content.encode("utf-8"))
+        assert calls["outer"] == ["inner", "printf"]
+        assert calls["inner"] == ["helper"]
 
     def test_no_calls(self):
         """Test function with no calls."""
@@ -189,12 +178,8 @@ class TestGetFunctionCalls:
             x += 1;
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            calls = get_function_calls(str(file_path))
-            assert calls["empty"] == []
-        finally:
-            file_path.unlink()
+        calls = get_function_calls_from_source(content.encode("utf-8"))
+        assert calls["empty"] == []
 
     def test_recursive_calls(self):
         """Test recursive function calls."""
@@ -205,23 +190,32 @@ class TestGetFunctionCalls:
             }
         }
         """
-        file_path = self.create_test_file(content)
-        try:
-            calls = get_function_calls(str(file_path))
-            assert calls["factorial"] == ["factorial"]
-        finally:
-            file_path.unlink()
+        calls = get_function_calls_from_source(content.encode("utf-8"))
+        assert calls["factorial"] == ["factorial"]
+
+    def test_from_source_bytes(self):
+        """Test parsing source bytes directly, with non-ASCII text before names."""
+        content = """
+        // Größe berechnen
+        void größe() {}
+        void area() {
+            printf("π ≈ 3.14");
+            compute();
+        }
+        """.encode("utf-8")
+        calls = get_function_calls_from_source(content)
+        assert calls["area"] == ["printf", "compute"]
+
+    def test_nested_calls_in_source_order(self):
+        """Test calls used as arguments are listed in source order."""
+        content = b"void f() { a(b(c(), d()), e()); g(h()); }\nvoid k() { x(); }\n"
+        calls = get_function_calls_from_source(content)
+        assert calls == {"f": ["a", "b", "c", "d", "e", "g", "h"], "k": ["x"]}
 
 
 class TestGetFunctionNodes:
     """Test function node extraction with line numbers."""
 
-    def create_test_file(self, content: str) -> Path:
-        """Create a temporary C file with given content."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
-            f.write(content)
-            return Path(f.name)
-
     def test_function_line_numbers(self):
         """Test extracting functions with line numbers."""
         content = """#include <stdio.h>
@@ -235,22 +229,16 @@ int main() {
     return 0;
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            nodes = get_function_nodes(str(file_path))
-
-            # Find foo function
-            foo_node = next(node for node in nodes if node["name"] == "foo")
-            assert foo_node["start"] == 3  # Line 3: void foo()
-            assert foo_node["end"] == 5  # Line 5: }
+        nodes = get_function_nodes_from_source(content.encode("utf-8"))
+        nodes_by_name = {node.name: node for node in nodes}
 
-            # Find main function
-            main_node = next(node for node in nodes if node["name"] == "main")
-            assert main_node["start"] == 7  # Line 7: int main()
-            assert main_node["end"] == 10  # Line 10: }
+        foo_node = nodes_by_name["foo"]
+        assert foo_node.start == 3  # Line 3: void foo()
+        assert foo_node.end == 5  # Line 5: }
 
-        finally:
-            file_path.unlink()
+        main_node = nodes_by_name["main"]
+        assert main_node.start == 7  # Line 7: int main()
+        assert main_node.end == 10  # Line 10: }
 
     def test_multiline_function(self):
         """Test function spanning multiple lines."""
@@ -260,11 +248,109 @@ int main() {
     printf("%d", x + y);
 }
 """
-        file_path = self.create_test_file(content)
-        try:
-            nodes = get_function_nodes(str(file_path))
-            func_node = next(node for node in nodes if node["name"] == "multiline")
-            assert func_node["start"] == 1  # Line 1: void multiline() {
-            assert func_node["end"] == 5  # Line 5: }
-        finally:
-            file_path.unlink()
+        nodes = get_function_nodes_from_source(content.encode("utf-8"))
+        func_node = {node.name: node for node in nodes}["multiline"]
+        assert func_node.start == 1  # Line 1: void multiline() {
+        assert func_node.end == 5  # Line 5: }
+
+    def test_non_ascii_before_names(self, tmp_path):
+        """Test node names after non-ASCII text are not shifted by byte offsets."""
+        file_path = tmp_path / "units.c"
+        file_path.write_bytes("/* π ≈ 3.14 */\nvoid area() {\n}\n".encode("utf-8"))
+        assert get_function_nodes(str(file_path)) == [FunctionNode("area", 2, 3)]
+
+    def test_from_source_bytes(self):
+        """Test extracting line numbers from source bytes without a file."""
+        content = b"int x;\n\nvoid f() {\n}\nint g() { return 0; }\n"
+        assert get_function_nodes_from_source(content) == [
+            FunctionNode("f", 3, 4),
+            FunctionNode("g", 5, 5),
+        ]
+
+
+class TestParseCache:
+    """Test reuse of parsed trees across extractors."""
+
+    def test_unchanged_file_parsed_once(self, tmp_path):
+        """Test extractors share one parse of an unchanged file."""
+        file_path = tmp_path / "a.c"
+        file_path.write_text("void a() { b(); }\n")
+        _parse_file.cache_clear()
+
+        assert get_functions(str(file_path)) == ["a"]
+        assert get_function_calls(str(file_path)) == {"a": ["b"]}
+        assert get_function_nodes(str(file_path))[0].name == "a"
+        info = _parse_file.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+
+    def test_path_spellings_share_one_parse(self, tmp_path, monkeypatch):
+        """Test relative and absolute spellings of a file reuse one parse."""
+        (tmp_path / "a.c").write_text("void a() { b(); }\n")
+        monkeypatch.chdir(tmp_path)
+        _parse_file.cache_clear()
+
+        assert _parse_path("a.c") is _parse_path(str(tmp_path / "a.c"))
+        assert _parse_path("./a.c") is _parse_path("a.c")
+        assert _parse_file.cache_info().misses == 1
+
+    def test_edited_file_reparsed(self, tmp_path):
+        """Test a file is parsed again once its contents change."""
+        file_path = tmp_path / "a.c"
+        file_path.write_text("void a() {}\n")
+        assert get_functions(str(file_path)) == ["a"]
+
+        file_path.write_text("void a() {}\nvoid bb() {}\n")
+        assert get_functions(str(file_path)) == ["a", "bb"]
+
+    def test_incremental_reparse_matches_fresh_parse(self, tmp_path):
+        """Test reparsing from the previous tree gives the same result."""
+        file_path = tmp_path / "a.c"
+        file_path.write_text("int a() {\n    b();\n}\n\nint c() { return 0; }\n")
+        assert get_function_calls(str(file_path)) == {"a": ["b"], "c": []}
+
+        edited = "int a() {\n    b();\n    d(e());\n}\n\nint c() { return 0; }\n"
+        file_path.write_text(edited)
+        nodes = get_function_nodes(str(file_path))
+
+        assert get_function_calls(str(file_path)) == {"a": ["b", "d", "e"], "c": []}
+        assert nodes == [
+            FunctionNode("a", 1, 4),
+            FunctionNode("c", 6, 6),
+        ]
+        fresh = _parse_source(edited.encode())
+        assert str(_parse_path(str(file_path)).root_node) == str(fresh.root_node)
+
+    def test_reparse_bases_bounded(self, tmp_path, monkeypatch):
+        """Test only the most recent bases within the byte budget are kept."""
+        monkeypatch.setattr(parser, "_last_parse", {})
+        monkeypatch.setattr(parser, "REPARSE_BASE_COUNT", 2)
+        monkeypatch.setattr(parser, "REPARSE_BASE_BYTES", 64)
+        paths = []
+        for name in ("a", "b", "c"):
+            paths.append(tmp_path / f"{name}.c")
+            paths[-1].write_text(f"void {name}() {{}}\n")
+            _parse_path(str(paths[-1]))
+        assert list(parser._last_parse) == [str(p) for p in paths[1:]]
+
+        large = tmp_path / "large.c"
+        large.write_text("void large() {}\n" + "int x;\n" * 20)
+        _parse_path(str(large))
+        assert str(large) not in parser._last_parse
+
+    def test_parser_reused_per_thread(self):
+        """Test each thread keeps one parser across parses."""
+        parsers = [_parser(), _parser()]
+        worker = threading.Thread(target=lambda: parsers.append(_parser()))
+        worker.start()
+        worker.join()
+        assert parsers[0] is parsers[1]
+        assert parsers[2] is not parsers[0]
+
+    def test_edited_tree_spans_scattered_changes(self):
+        """Test an edit covering several separate changes reparses correctly."""
+        old = "int a() { x(); }\nint b() { y(); }\nint c() { z(); }\n".encode()
+        new = "int a() { xx(); }\nint b() { y(); }\nint cc() { z(); w(); }\n".encode()
+
+        tree = _parse_source(new, _edited_tree(old, _parse_source(old), new))
+
+        assert str(tree.root_node) == str(_parse_source(new).root_node)
@@ -7,6 +7,8 @@ import pytest
 
 from src.utils.path_utils import get_file_url, sanitize_filename
 
+RESERVED_NAMES = ("CON", "PRN", "AUX", "NUL", "COM1", "COM2", "LPT1", "LPT9")
+
 
 class TestSanitizeFilename:
     """Test filename sanitization functionality."""
@@ -47,11 +49,17 @@ class TestSanitizeFilename:
 
     def test_windows_reserved_names(self):
         """Test prefixing Windows reserved names."""
-        reserved_names = ["CON", "PRN", "AUX", "NUL", "COM1", "COM2", "LPT1", "LPT9"]
-        for name in reserved_names:
+        for name in RESERVED_NAMES:
             assert sanitize_filename(name) == f"_{name}"
             assert sanitize_filename(name.lower()) == f"_{name.lower()}"
-            assert sanitize_filename(name.upper()) == f"_{name.upper()}"
+            assert sanitize_filename(name.title()) == f"_{name.title()}"
+
+    def test_reserved_names_with_extension_or_longer_base(self):
+        """Test reserved names with extensions are prefixed, longer bases are not."""
+        assert sanitize_filename("con.html") == "_con.html"
+        assert sanitize_filename("Lpt3.tar.gz") == "_Lpt3.tar.gz"
+        assert sanitize_filename("console.html") == "console.html"
+        assert sanitize_filename("COM10") == "COM10"
 
     def test_control_characters(self):
         """Test removing control characters."""
@@ -113,6 +121,13 @@ class TestGetFileUrl:
         assert url.startswith("file://")
         assert "C:/tmp/test.html" in url
 
+    def test_absolute_path_not_resolved(self, tmp_path):
+        """Test absolute paths keep their symlinked form."""
+        (tmp_path / "real").mkdir()
+        (tmp_path / "link").symlink_to(tmp_path / "real")
+        url = get_file_url(tmp_path / "link" / "test.html")
+        assert url == (tmp_path / "link" / "test.html").as_uri()
+
     def test_relative_path(self):
         """Test relative path conversion."""
         path = Path("test.html")
@@ -148,6 +163,23 @@ class TestGetFileUrl:
 
         assert absolute_url == expected_url
 
+    def test_relative_path_follows_working_directory(self, tmp_path, monkeypatch):
+        """Test cached relative URLs are resolved against the current directory."""
+        root = tmp_path.resolve()
+        (root / "a").mkdir()
+        (root / "b").mkdir()
+        monkeypatch.chdir(root / "a")
+        assert get_file_url(Path("x.html")) == (root / "a" / "x.html").as_uri()
+        assert get_file_url(Path("x.html")) == (root / "a" / "x.html").as_uri()
+        monkeypatch.chdir(root / "b")
+        assert get_file_url(Path("x.html")) == (root / "b" / "x.html").as_uri()
+
+    def test_relative_path_is_normalized(self, tmp_path, monkeypatch):
+        """Test dot segments in relative paths are collapsed."""
+        root = tmp_path.resolve()
+        monkeypatch.chdir(root)
+        assert get_file_url(Path("a/../b/./x.html")) == (root / "b" / "x.html").as_uri()
+
     def test_subdirectory_path(self):
         """Test path with subdirectories."""
         path = Path("artifacts/project/commit/call_graphs/graph.html")